@@ -3,27 +3,84 @@ Main Organized Agent for handling user conversations and task management.
 """
 
 import os
-import yaml
-from pathlib import Path
-from fastapi import HTTPException
-from typing import Any, Dict
+from datetime import date
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 from beeai_framework.agents.tool_calling import ToolCallingAgent
 from beeai_framework.memory import TokenMemory
-from beeai_framework.backend import ChatModel
+from beeai_framework.backend import AnyMessage, ChatModel
 from beeai_framework.adapters.litellm.utils import litellm_debug
 
-
+from .config import get_config
 from .tools import TasksFileReadTool, TasksFileEditTool
 
-# Configuration path
-CONFIG_PATH = Path.home() / ".config" / "organized" / "config.yaml"
+# Logging every request to and response from the model is expensive, so only
+# do it when asked to
+if os.getenv("ORGANIZED_LITELLM_DEBUG") == "1":
+    litellm_debug(True)
+
+# The system prompt must stay byte-identical between requests so that the
+# provider can reuse its cached processing of the prompt prefix. Don't format
+# per-request state (task counts, timestamps, ...) into it - the agent should
+# fetch current state through tools such as tasks_file_read instead.
+_SYSTEM_INSTRUCTIONS = """\
+You are an AI assistant for the "Organized" personal organization application. You help users manage their tasks, notes, and work history through a structured markdown file (TASKS.md).
+
+Your primary responsibilities:
+1. Help users read, understand, and modify their TASKS.md file
+2. Assist with task management, prioritization, and organization
+3. Provide insights based on the user's work history and notes
+4. Maintain helpful and conversational interactions
+
+The TASKS.md file follows this schema:
+- Projects are marked with ## headings
+- Major tasks are marked with ### headings 
+- Tasks can have priority indicators: ⏫ (high), ⬆ (medium)
+- Completed tasks are marked with [x] and ✅ date
+- Work history entries use + prefix with dates
+- Important notes use ★ prefix with dates
+
+When editing TASKS.md:
+- Preserve the existing structure and formatting
+- Follow the established schema patterns
+- Include appropriate context in your edits
+- Be precise with text matching for replacements
+
+Always be helpful, concise, and focused on productivity and organization."""
+
+
+def _format_date(data: Dict[str, Any]) -> str:
+    # BeeAI's default system template includes the current time down to the
+    # second, which would change the system prompt on every request; the date
+    # is all that's needed to date entries in TASKS.md.
+    return date.today().isoformat()
+
+
+# Custom templates for system instructions, shared by all agent instances
+_TEMPLATES: Dict[str, Any] = {
+    "system": lambda template: template.update(
+        functions={"formatDate": _format_date},
+        defaults={"instructions": _SYSTEM_INSTRUCTIONS},
+    )
+}
 
 
-def get_config():
-    """Loads the configuration from config.yaml."""
-    if not CONFIG_PATH.exists():
-        raise HTTPException(status_code=500, detail="Config file not found")
-    return yaml.safe_load(CONFIG_PATH.read_text())
+@lru_cache(maxsize=4)
+def _get_chat_model(gemini_model: str, api_key: str) -> ChatModel:
+    """
+    Get the chat model for a Gemini model name.
+
+    Chat models hold no conversation state, so they are shared between agent
+    instances rather than set up again each time the agent is reset. The API
+    key is part of the cache key so that a changed key takes effect.
+    """
+    return ChatModel.from_name(f"gemini:{gemini_model}")
+
+
+@lru_cache(maxsize=1)
+def _get_tools() -> Tuple[TasksFileReadTool, TasksFileEditTool]:
+    """Get the tools for the agent; they are stateless and shared as well."""
+    return TasksFileReadTool(), TasksFileEditTool()
 
 
 class OrganizedAgent(ToolCallingAgent):
@@ -52,57 +109,35 @@ class OrganizedAgent(ToolCallingAgent):
             api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise ValueError(
-                "Gemini API key not found in config.yaml or GEMINI_API_KEY environment variable"
+                "Gemini API key not found in config file or GEMINI_API_KEY environment variable"
             )
 
         # Set environment variable for BeeAI to use
         os.environ["GEMINI_API_KEY"] = api_key
-        litellm_debug(True)
 
         # Initialize LLM
-        llm = ChatModel.from_name(f"gemini:{gemini_model}")
+        llm = _get_chat_model(gemini_model, api_key)
         # llm = GeminiChatModel(model_name=gemini_model)
 
         # Initialize memory for conversation context
         memory = TokenMemory(llm=llm)
 
         # Initialize tools
-        tools = [
-            TasksFileReadTool(),
-            TasksFileEditTool(),
-        ]
-
-        # Custom templates for system instructions
-        templates: Dict[str, Any] = {
-            "system": lambda template: template.update(
-                defaults={
-                    "instructions": """\
-You are an AI assistant for the "Organized" personal organization application. You help users manage their tasks, notes, and work history through a structured markdown file (TASKS.md).
-
-Your primary responsibilities:
-1. Help users read, understand, and modify their TASKS.md file
-2. Assist with task management, prioritization, and organization
-3. Provide insights based on the user's work history and notes
-4. Maintain helpful and conversational interactions
-
-The TASKS.md file follows this schema:
-- Projects are marked with ## headings
-- Major tasks are marked with ### headings 
-- Tasks can have priority indicators: ⏫ (high), ⬆ (medium)
-- Completed tasks are marked with [x] and ✅ date
-- Work history entries use + prefix with dates
-- Important notes use ★ prefix with dates
-
-When editing TASKS.md:
-- Preserve the existing structure and formatting
-- Follow the established schema patterns
-- Include appropriate context in your edits
-- Be precise with text matching for replacements
-
-Always be helpful, concise, and focused on productivity and organization."""
-                }
-            )
-        }
+        tools = list(_get_tools())
 
         # Initialize the agent
-        super().__init__(llm=llm, tools=tools, memory=memory, templates=templates)
+        super().__init__(llm=llm, tools=tools, memory=memory, templates=_TEMPLATES)
+
+        # Chat history as returned by /api/chat/history, built up incrementally
+        # from memory.messages; _history_cursor is the number of messages
+        # already processed and _history_last_message the last one of those,
+        # used to detect messages being evicted from the front of memory.
+        self._history_cache: List[Dict[str, str]] = []
+        self._history_cursor = 0
+        self._history_last_message: Optional[AnyMessage] = None
+
+    def reset_history_cache(self) -> None:
+        """Discard the incrementally built chat history."""
+        self._history_cache = []
+        self._history_cursor = 0
+        self._history_last_message = None
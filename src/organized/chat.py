@@ -2,12 +2,16 @@
 Chat endpoints for the Organized agent interface.
 """
 
-import json
+import asyncio
 import logging
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+import orjson
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from beeai_framework.backend.message import MessageToolCallContent
+from beeai_framework.backend import AnyMessage
+from beeai_framework.backend.message import MessageToolCallContent, Role
 
 from .agent import OrganizedAgent
 
@@ -16,6 +20,18 @@ logger = logging.getLogger(__name__)
 
 # Global agent instance
 _agent_instance: Optional[OrganizedAgent] = None
+# Serializes creation of the agent instance
+_agent_lock = asyncio.Lock()
+
+# Agent runs read and update the agent's shared memory, so run one at a time
+_run_lock = asyncio.Lock()
+# Chat requests in progress, keyed by message
+_chat_runs: Dict[str, "asyncio.Future[str]"] = {}
+
+# Name of the tool call that gets special handling. Content items are
+# compared with `type(...) is MessageToolCallContent` below: beeai doesn't
+# subclass it, and the exact type check is cheaper than isinstance().
+_FINAL_ANSWER_TOOL = "final_answer"
 
 # Chat router
 router = APIRouter(prefix="/api/chat", tags=["chat"])
@@ -40,14 +56,32 @@ class ChatHistoryResponse(BaseModel):
     messages: List[Dict[str, str]]
 
 
-def get_agent() -> OrganizedAgent:
+async def get_agent() -> OrganizedAgent:
     """Get or create the agent instance."""
     global _agent_instance
     if _agent_instance is None:
-        _agent_instance = OrganizedAgent()
+        async with _agent_lock:
+            if _agent_instance is None:
+                # Construction reads the config file and sets up the chat
+                # model, so keep it off the event loop
+                _agent_instance = await asyncio.to_thread(OrganizedAgent)
     return _agent_instance
 
 
+async def warm_agent() -> None:
+    """
+    Create the agent instance ahead of the first chat request.
+
+    Failures are logged rather than raised so that the rest of the application
+    can start without a usable configuration; get_agent() will try again when
+    the agent is first needed.
+    """
+    try:
+        await get_agent()
+    except Exception as e:
+        logger.warning(f"Could not initialize agent at startup: {e}")
+
+
 @router.post("", response_model=ChatResponse)
 async def chat(message: ChatMessage, agent: OrganizedAgent = Depends(get_agent)):
     """
@@ -61,15 +95,117 @@ async def chat(message: ChatMessage, agent: OrganizedAgent = Depends(get_agent))
         The agent's response
     """
 
-    # Run the agent with the user's message
-    response = await agent.run(message.message)
+    # A request identical to one that is still running (say, the message was
+    # submitted twice) shares that run's response rather than starting another
+    while True:
+        pending = _chat_runs.get(message.message)
+        if pending is None:
+            response_text = await _run_chat(agent, message.message)
+            break
+        try:
+            response_text = await asyncio.shield(pending)
+            break
+        except _RunCancelled:
+            # The request that started the run went away, so start another
+            continue
 
     return ChatResponse(
-        response=response.result.text,
+        response=response_text,
         session_id=None,  # For future session management
     )
 
 
+class _RunCancelled(Exception):
+    """The chat request that a run was started for was cancelled."""
+
+
+async def _run_chat(agent: OrganizedAgent, message: str) -> str:
+    """Run the agent on a message, sharing the response with identical requests."""
+    future: "asyncio.Future[str]" = asyncio.get_running_loop().create_future()
+    _chat_runs[message] = future
+    try:
+        async with _run_lock:
+            response = await agent.run(message)
+        response_text = response.result.text
+        future.set_result(response_text)
+        return response_text
+    except asyncio.CancelledError:
+        # Requests waiting for the response didn't cancel anything themselves,
+        # so tell them to retry rather than passing the cancellation on
+        future.set_exception(_RunCancelled())
+        future.exception()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Mark the exception as retrieved, there may be no other waiters
+        future.exception()
+        raise
+    finally:
+        del _chat_runs[message]
+
+
+@router.post("/stream")
+async def chat_stream(message: ChatMessage, agent: OrganizedAgent = Depends(get_agent)):
+    """
+    Streaming variant of the main chat endpoint.
+
+    The agent's progress is sent as server-sent events, each with a JSON
+    object as data: {"type": "tool_call", "tool": name} for each tool
+    the agent calls along the way, then {"type": "response", "response": text}
+    with the final answer, or {"type": "error", "message": text}.
+
+    Args:
+        message: The user message to process
+        agent: The agent instance (injected via dependency)
+
+    Returns:
+        A text/event-stream response
+    """
+
+    async def events() -> AsyncIterator[bytes]:
+        try:
+            async with _run_lock:
+                async for item in _stream_run(agent, message.message):
+                    yield item
+        except Exception as e:
+            logger.error(f"Error streaming chat response: {e}")
+            yield _sse_event({"type": "error", "message": str(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+async def _stream_run(agent: OrganizedAgent, message: str) -> AsyncIterator[bytes]:
+    """Run the agent on a message, generating server-sent events as it goes."""
+    iteration_start = 0
+    async for data, event in agent.run(message):
+        messages = data.state.memory.messages
+        if event.name == "start":
+            iteration_start = len(messages)
+        elif event.name == "success":
+            for tool_call in _tool_calls(messages[iteration_start:]):
+                if tool_call.tool_name != _FINAL_ANSWER_TOOL:
+                    yield _sse_event({"type": "tool_call", "tool": tool_call.tool_name})
+
+            if data.state.result is not None:
+                yield _sse_event(
+                    {"type": "response", "response": data.state.result.text}
+                )
+
+
+def _sse_event(data: Dict[str, str]) -> bytes:
+    """Format a server-sent event with a JSON payload."""
+    return b"data: " + orjson.dumps(data) + b"\n\n"
+
+
+def _tool_calls(messages: List[AnyMessage]) -> Iterator[MessageToolCallContent]:
+    """Generate the tool calls made in the given messages."""
+    for msg in messages:
+        if msg.role is Role.ASSISTANT:
+            for content_item in msg.content:
+                if type(content_item) is MessageToolCallContent:
+                    yield content_item
+
+
 @router.get("/history", response_model=ChatHistoryResponse)
 async def get_chat_history(agent: OrganizedAgent = Depends(get_agent)):
     """
@@ -82,31 +218,25 @@ async def get_chat_history(agent: OrganizedAgent = Depends(get_agent)):
         The conversation history
     """
     try:
-        # Get messages from agent memory
         messages = agent.memory.messages
 
-        # Extract only user messages and final assistant responses
-        history = []
-
-        for msg in messages:
-            if str(msg.role) == "user":
-                history.append({"role": "user", "content": msg.text})
-            elif str(msg.role) == "assistant":
-                # Look for final_answer tool calls
-                for content_item in msg.content:
-                    if (
-                        isinstance(content_item, MessageToolCallContent)
-                        and content_item.tool_name == "final_answer"
-                    ):
-                        try:
-                            args = json.loads(content_item.args)
-                            response = args.get("response", "")
-                            if response:
-                                history.append(
-                                    {"role": "assistant", "content": response}
-                                )
-                        except:
-                            pass
+        # Only the messages added since the last call need to be processed,
+        # unless messages were evicted from or replaced in memory, in which
+        # case rebuild the history from scratch.
+        cursor = agent._history_cursor
+        if cursor > len(messages) or (
+            cursor > 0 and messages[cursor - 1] is not agent._history_last_message
+        ):
+            agent.reset_history_cache()
+            cursor = 0
+
+        history = agent._history_cache
+        history.extend(
+            entry for msg in messages[cursor:] for entry in _history_entries(msg)
+        )
+
+        agent._history_cursor = len(messages)
+        agent._history_last_message = messages[-1] if messages else None
 
         return ChatHistoryResponse(messages=history)
 
@@ -117,6 +247,33 @@ async def get_chat_history(agent: OrganizedAgent = Depends(get_agent)):
         )
 
 
+def _history_entries(msg: AnyMessage) -> Iterator[Dict[str, str]]:
+    """
+    Generate the chat history entries for a single memory message.
+
+    Only user messages and final assistant responses are included.
+    """
+    if msg.role is Role.USER:
+        yield {"role": "user", "content": msg.text}
+    elif msg.role is Role.ASSISTANT:
+        # Look for final_answer tool calls
+        for content_item in msg.content:
+            if (
+                type(content_item) is MessageToolCallContent
+                and content_item.tool_name == _FINAL_ANSWER_TOOL
+            ):
+                try:
+                    args = orjson.loads(content_item.args)
+                except orjson.JSONDecodeError:
+                    # Arguments the model produced aren't valid JSON, skip them
+                    continue
+                if not isinstance(args, dict):
+                    continue
+                response = args.get("response", "")
+                if response:
+                    yield {"role": "assistant", "content": response}
+
+
 @router.post("/clear")
 async def clear_chat(agent: OrganizedAgent = Depends(get_agent)):
     """
@@ -131,6 +288,7 @@ async def clear_chat(agent: OrganizedAgent = Depends(get_agent)):
     try:
         # Clear the agent's memory
         agent.memory.reset()
+        agent.reset_history_cache()
 
         return {"message": "Chat history cleared successfully"}
 
@@ -196,3 +354,33 @@ async def reset_agent():
     except Exception as e:
         logger.error(f"Error resetting agent: {e}")
         raise HTTPException(status_code=500, detail=f"Error resetting agent: {str(e)}")
+
+
+@router.post("/reload")
+async def reload_agent():
+    """
+    Reload the agent by creating a new instance.
+    Unlike /reset, the conversation in the current agent's memory is
+    carried over to the new instance.
+
+    Returns:
+        Success message
+    """
+    try:
+        global _agent_instance
+        async with _agent_lock:
+            # If creating the new agent fails, the current one stays in place
+            new_agent = await asyncio.to_thread(OrganizedAgent)
+
+            # Copy the conversation without a run in progress, so that a
+            # turn finishing meanwhile isn't left behind in the old agent
+            async with _run_lock:
+                if _agent_instance is not None:
+                    await new_agent.memory.add_many(_agent_instance.memory.messages)
+                _agent_instance = new_agent
+
+        return {"message": "Agent reloaded successfully"}
+
+    except Exception as e:
+        logger.error(f"Error reloading agent: {e}")
+        raise HTTPException(status_code=500, detail=f"Error reloading agent: {str(e)}")
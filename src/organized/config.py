@@ -1,15 +1,53 @@
+import os
+import tomllib
 from functools import cache
 from pathlib import Path
+from typing import Tuple
 
 from fastapi import HTTPException
-import yaml
 
-CONFIG_PATH = Path.home() / ".config" / "organized" / "config.yaml"
+
+@cache
+def _config_paths() -> Tuple[Path, ...]:
+    """
+    Returns the configuration files to look for, in order of preference.
+
+    $ORGANIZED_CONFIG overrides the default of config.toml, or config.yaml if
+    that doesn't exist, in ~/.config/organized.
+    """
+    override = os.environ.get("ORGANIZED_CONFIG")
+    if override:
+        return (Path(override),)
+
+    config_dir = Path.home() / ".config" / "organized"
+    return (config_dir / "config.toml", config_dir / "config.yaml")
+
+
+def _load_yaml_config(path: Path):
+    # PyYAML is only needed for configurations that haven't moved to
+    # TOML, so don't import it unless we get here.
+    import yaml
+
+    try:
+        from yaml import CSafeLoader as SafeLoader
+    except ImportError:
+        from yaml import SafeLoader
+
+    return yaml.load(path.read_bytes(), Loader=SafeLoader)
 
 
 @cache
 def get_config():
-    """Loads the configuration from config.yaml."""
-    if not CONFIG_PATH.exists():
-        raise HTTPException(status_code=500, detail="Config file not found")
-    return yaml.safe_load(CONFIG_PATH.read_text())
+    """
+    Loads the configuration from the first configuration file that exists.
+
+    The result is cached for the life of the process, so callers can use this
+    freely; the server needs a restart to pick up configuration changes.
+    """
+    for path in _config_paths():
+        if path.exists():
+            if path.suffix == ".toml":
+                return tomllib.loads(path.read_text(encoding="utf-8"))
+            return _load_yaml_config(path)
+
+    raise HTTPException(status_code=500, detail="Config file not found")
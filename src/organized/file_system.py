@@ -8,28 +8,173 @@ as specified in FILESYSTEM_DESIGN.md.
 
 import abc
 import asyncio
+import hashlib
 import logging
 import os
-import subprocess
-import tempfile
-from contextlib import asynccontextmanager
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing, asynccontextmanager
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional, Callable, AsyncIterator, Tuple
+from typing import Dict, List, Optional, Callable, AsyncIterator, Set, Tuple
 
+import pygit2
+from pygit2.enums import FileStatus, ObjectType
 from watchfiles import awatch, Change
 from diff_match_patch import diff_match_patch
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+# (mtime_ns, size, inode), used to tell if a file changed without reading it
+StatKey = Tuple[int, int, int]
+
+
+def _stat_and_read(
+    file_path: str, known: StatKey, known_data: bytes
+) -> Optional[Tuple[os.stat_result, bytes, Optional[str]]]:
+    """
+    Read a file if it changed since it was last seen. Runs in a worker thread.
+
+    Args:
+        file_path: Absolute path to the file
+        known: State of the version we already have
+        known_data: Content of the version we already have
+
+    Returns:
+        None if the file's stat is unchanged, otherwise a (stat, data, content)
+        tuple where content is None if the bytes match what we already have
+
+    Raises:
+        FileNotFoundError: If the file no longer exists
+    """
+    # Stat first, then read to avoid race condition
+    file_stat = os.stat(file_path)
+    if (file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino) == known:
+        return None  # No actual change
+
+    with open(file_path, "rb") as f:
+        data = f.read()
+    if data == known_data:
+        # Touched or rewritten with identical content, skip decoding
+        return file_stat, data, None
+
+    return file_stat, data, data.decode("utf-8")
+
+
+def content_hash(content: str) -> str:
+    """Hash identifying a version of a file's content, as used by patch_file()."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _io_worker_count(path: Path) -> int:
+    """
+    Choose the number of threads for file reads under path.
+
+    Parallel reads thrash a rotational disk, while SSDs benefit from more
+    requests in flight. Detection uses the Linux sysfs entry for the device;
+    elsewhere, or for devices without one (tmpfs, overlay), assume an SSD.
+    """
+    try:
+        dev = os.stat(path).st_dev
+        block = f"/sys/dev/block/{os.major(dev)}:{os.minor(dev)}"
+        # Partitions don't have a queue directory, their parent device does
+        for queue in (f"{block}/queue", f"{block}/../queue"):
+            try:
+                with open(f"{queue}/rotational") as f:
+                    if f.read().strip() == "1":
+                        return 2
+                break
+            except FileNotFoundError:
+                continue
+    except (OSError, ValueError):
+        pass
+
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+def _stat_key(path: Path) -> Optional[StatKey]:
+    """Return the StatKey for a path, or None if it doesn't exist."""
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _stat_and_read_new(filename: str, file_path: Path) -> Tuple[os.stat_result, bytes]:
+    """
+    Read a file that isn't tracked yet. May be run in a worker thread.
+
+    Args:
+        filename: Path to the file relative to repository root
+        file_path: Absolute path to the file
+
+    Returns:
+        (stat, data) tuple
+
+    Raises:
+        FileNotFoundError: If the file doesn't exist
+    """
+    # Stat first, then read to avoid race condition
+    try:
+        file_stat = file_path.stat()
+        data = file_path.read_bytes()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"File not found: {filename}")
+
+    return file_stat, data
+
+
+def _sync_files(paths: Set[Path]) -> None:
+    """
+    fsync the given files, and the directories containing them, so that the
+    renames that put them in place are durable too. May be run in a worker
+    thread.
+    """
+    for path in (*paths, *{path.parent for path in paths}):
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            # Deleted since we wrote it
+            continue
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+@dataclass(slots=True)
 class File:
     """Represents a file with its current state."""
 
-    content: str
+    data: bytes  # UTF-8 encoded content, decoded on demand
     ref_count: int = 0
-    mtime: float = 0.0
+    mtime_ns: int = 0
+    size: int = 0
+    ino: int = 0
+    blob_oid: Optional[str] = None  # For committed files, the git blob served
+
+    @property
+    def content(self) -> str:
+        return self.data.decode("utf-8")
+
+    @content.setter
+    def content(self, content: str) -> None:
+        self.data = content.encode("utf-8")
+
+    @property
+    def state(self) -> StatKey:
+        """The values used to cheaply detect on-disk changes."""
+        return (self.mtime_ns, self.size, self.ino)
+
+    def update_from_disk(self, file_stat: os.stat_result, data: bytes) -> None:
+        """Record the content and stat of the version on disk."""
+        self.data = data
+        self.mtime_ns = file_stat.st_mtime_ns
+        self.size = file_stat.st_size
+        self.ino = file_stat.st_ino
 
 
 class FileSystemWatcher(abc.ABC):
@@ -51,8 +196,22 @@ class FileSystem:
     """
     Core filesystem abstraction that manages file operations,
     reference counting, and git integration.
+
+    All state is owned by the event loop thread. Worker threads only run
+    functions that read from disk or the repository and return the result;
+    the loop applies it, re-checking any state that may have changed while
+    it was waiting.
     """
 
+    # Maximum number of git blobs kept in memory
+    BLOB_CACHE_SIZE = 256
+
+    # Content length (in characters) above which merges diff by line
+    LINE_DIFF_THRESHOLD = 4096
+
+    # Maximum number of validated paths remembered
+    PATH_CACHE_SIZE = 1024
+
     def __init__(self, repository_path: Path):
         """
         Initialize the FileSystem with a git repository.
@@ -77,14 +236,63 @@ class FileSystem:
         if not git_dir.exists():
             raise ValueError(f"Path is not a git repository: {repository_path}")
 
+        # Threads for file and blob reads, kept separate from the default
+        # executor so reads are sized to the disk and don't queue behind
+        # commits. Threads are only started when needed.
+        self._io_executor = ThreadPoolExecutor(
+            max_workers=_io_worker_count(self.repository_path),
+            thread_name_prefix="organized-io",
+        )
+
+        # Long-lived handle for reading objects without spawning git
+        # processes. Like the rest of the state, it is only used from the
+        # event loop thread; worker threads open their own handles.
+        self._repo = pygit2.Repository(str(self.repository_path))
+        # Repository handles for the I/O threads, one per thread
+        self._thread_repos = threading.local()
+
+        # Git objects are immutable, so blob contents can be cached
+        # by OID and never need invalidating
+        self._blob_cache: OrderedDict[str, bytes] = OrderedDict()
+
+        # Shared diff-match-patch instance for merges. The diff timeout bounds
+        # the time spent on pathological inputs; when it is hit the diff is
+        # coarser, so more patches may fail to apply and be discarded.
+        self._dmp = diff_match_patch()
+        self._dmp.Diff_Timeout = 0.5
+        self._dmp.Match_Threshold = 0.5
+        self._dmp.Patch_DeleteThreshold = 0.5
+
         # Initialize internal state
         self.files: Dict[str, File] = {}
-        self.watchers: List[FileSystemWatcher] = []
+        # Watchers notified of changes to all files
+        self.watchers: Set[FileSystemWatcher] = set()
+        # Watchers notified only of changes to particular files
+        self._subscriptions: Dict[str, Set[FileSystemWatcher]] = {}
+
+        # Serializes updates of open committed files on HEAD changes
+        self._committed_files_lock = asyncio.Lock()
+
+        # filename => absolute path, for paths that passed validation
+        self._validated_paths: Dict[str, Path] = {}
+
+        # Files written without fsync since the last commit
+        self._unsynced_paths: Set[Path] = set()
 
         # Git HEAD tracking
         self._git_head_file = self.repository_path / ".git" / "HEAD"
+        self._packed_refs_file = self.repository_path / ".git" / "packed-refs"
+        self._repository_prefix = str(self.repository_path) + os.sep
+        self._git_dir_str = str(self.repository_path / ".git")
+        self._git_head_file_str = str(self._git_head_file)
+        self._packed_refs_file_str = str(self._packed_refs_file)
         self._current_head_commit: Optional[str] = None
         self._current_ref_file: Optional[Path] = None  # File to watch for ref changes
+        # (HEAD stat, ref file stat, packed-refs stat, commit hash, ref file)
+        # from the last resolve
+        self._head_cache: Optional[
+            Tuple[StatKey, Optional[StatKey], Optional[StatKey], str, Path]
+        ] = None
 
     def _normalize_and_validate_path(self, filename: str) -> Path:
         """
@@ -99,6 +307,33 @@ class FileSystem:
         Raises:
             ValueError: If the path attempts to escape the repository or is not normalized
         """
+        # Validation only looks at the string, not the file system, so results
+        # can be reused. Invalid paths raise and are never cached.
+        path = self._validated_paths.get(filename)
+        if path is None:
+            path = self._validate_path(filename)
+            if len(self._validated_paths) >= self.PATH_CACHE_SIZE:
+                # Evict the oldest entry
+                del self._validated_paths[next(iter(self._validated_paths))]
+            self._validated_paths[filename] = path
+
+        return path
+
+    def _validate_path(self, filename: str) -> Path:
+        """Uncached implementation of _normalize_and_validate_path()."""
+        # Fast path for the common case of a plain, normalized relative path,
+        # using only string checks. Anything unusual goes through the full
+        # checks below, which produce the appropriate errors.
+        wrapped = f"/{filename}/"
+        if (
+            filename
+            and "//" not in wrapped
+            and "/./" not in wrapped
+            and "/../" not in wrapped
+            and "\0" not in filename
+        ):
+            return Path(self._repository_prefix + filename)
+
         # Convert to Path object
         path = Path(filename)
 
@@ -152,11 +387,14 @@ class FileSystem:
 
             if filename not in self.files:
                 # First time opening this committed file
-                content = self._read_file_from_git(git_file_path)
-
-                # For committed files, we don't track mtime from disk
-                # Instead, we could track the commit hash, but for now use 0
-                self.files[filename] = File(content=content, ref_count=1, mtime=0.0)
+                blob_oid = self._lookup_git_blob(git_file_path)
+                data = self._read_blob(blob_oid)
+                content = data.decode("utf-8")
+
+                # For committed files, we don't track mtime from disk;
+                # the blob OID identifies the version instead
+                self.files[filename] = File(data=data, ref_count=1, blob_oid=blob_oid)
+                return content
             else:
                 # File already open, increment reference count
                 self.files[filename].ref_count += 1
@@ -167,44 +405,94 @@ class FileSystem:
 
             if filename not in self.files:
                 # First time opening this file
-                if not file_path.exists():
-                    raise FileNotFoundError(f"File not found: {filename}")
-
-                # Stat first, then read to avoid race condition
-                file_stat = file_path.stat()
-                content = file_path.read_text(encoding="utf-8")
-
-                self.files[filename] = File(
-                    content=content, ref_count=1, mtime=file_stat.st_mtime
-                )
+                file_stat, data = _stat_and_read_new(filename, file_path)
+                return self._add_open_file(filename, file_stat, data)
             else:
                 # File already open, increment reference count
                 self.files[filename].ref_count += 1
 
         return self.files[filename].content
 
-    def close_file(self, filename: str) -> None:
+    async def open_file_async(self, filename: str) -> str:
+        """
+        Open a file and increment its reference count, without blocking the
+        event loop while reading it from disk.
+
+        Args:
+            filename: Path to the file relative to repository root.
+                     Use @filename to open the committed version from git.
+
+        Returns:
+            Current content of the file
+
+        Raises:
+            FileNotFoundError: If the file doesn't exist
+            ValueError: If the path attempts to escape the repository or is not normalized
+        """
+        if self._is_committed_file_path(filename) or filename in self.files:
+            # No file system access needed
+            return self.open_file(filename)
+
+        file_path = self._normalize_and_validate_path(filename)
+        loop = asyncio.get_running_loop()
+        file_stat, data = await loop.run_in_executor(
+            self._io_executor, _stat_and_read_new, filename, file_path
+        )
+
+        if filename in self.files:
+            # Opened by someone else while we were reading
+            self.files[filename].ref_count += 1
+            return self.files[filename].content
+
+        return self._add_open_file(filename, file_stat, data)
+
+    def _add_open_file(
+        self, filename: str, file_stat: os.stat_result, data: bytes
+    ) -> str:
+        """Start tracking a working tree file that was just read from disk."""
+        content = data.decode("utf-8")
+
+        file = File(data=data, ref_count=1)
+        file.update_from_disk(file_stat, data)
+        self.files[filename] = file
+
+        return content
+
+    def close_file(self, filename: str, count: int = 1) -> None:
         """
         Close a file and decrement its reference count.
 
         Args:
             filename: Path to the file relative to repository root
+            count: Number of references to drop, for closing several opens at once
         """
-        if filename in self.files:
-            self.files[filename].ref_count -= 1
+        file = self.files.get(filename)
+        if file is not None:
+            file.ref_count -= count
 
             # Remove from tracking if no longer referenced
-            if self.files[filename].ref_count <= 0:
+            if file.ref_count <= 0:
                 del self.files[filename]
 
     def add_watcher(self, watcher: FileSystemWatcher) -> None:
-        """Add a watcher to be notified of file changes."""
-        self.watchers.append(watcher)
+        """Add a watcher to be notified of changes to all files."""
+        self.watchers.add(watcher)
 
     def remove_watcher(self, watcher: FileSystemWatcher) -> None:
         """Remove a watcher from notifications."""
-        if watcher in self.watchers:
-            self.watchers.remove(watcher)
+        self.watchers.discard(watcher)
+
+    def subscribe(self, watcher: FileSystemWatcher, filename: str) -> None:
+        """Add a watcher to be notified of changes to a single file."""
+        self._subscriptions.setdefault(filename, set()).add(watcher)
+
+    def unsubscribe(self, watcher: FileSystemWatcher, filename: str) -> None:
+        """Stop notifying a watcher of changes to a single file."""
+        subscribers = self._subscriptions.get(filename)
+        if subscribers is not None:
+            subscribers.discard(watcher)
+            if not subscribers:
+                del self._subscriptions[filename]
 
     def write_file(
         self,
@@ -230,40 +518,73 @@ class FileSystem:
         """
         file_path = self._normalize_and_validate_path(filename)
 
-        # Use proper open/close pattern like edit_file
-        opened = False
         try:
-            # Try to open the file (may not exist)
-            try:
-                current_content = self.open_file(filename)
-                opened = True
-            except FileNotFoundError:
-                # File doesn't exist, create new entry
-                current_content = ""
+            current_content = self._get_current_content(filename, file_path)
+        except FileNotFoundError:
+            # File doesn't exist, it will be created
+            current_content = ""
+
+        # Intelligent conflict resolution using diff-match-patch
+        if last_content == current_content:
+            # No conflict - use new content directly
+            new_content = content
+        else:
+            # Conflict detected - perform three-way merge
+            new_content = self._merge_content(current_content, last_content, content)
 
-            # Intelligent conflict resolution using diff-match-patch
-            if last_content == current_content:
-                # No conflict - use new content directly
-                new_content = content
-            else:
-                # Conflict detected - perform three-way merge
-                new_content = self._merge_content(
-                    current_content, last_content, content
-                )
+        self._write_and_update(filename, file_path, new_content)
 
-            # Write to disk atomically and get mtime
-            mtime = self._write_file_atomic(file_path, new_content)
+        # Notify watchers after updating to ensure file state is consistent
+        self._notify_watchers(filename, new_content, source)
 
-            # Update internal state if file was already open
-            if opened:
-                self.files[filename].content = new_content
-                self.files[filename].mtime = mtime
+        return new_content
 
-        finally:
-            if opened:
-                self.close_file(filename)
+    def patch_file(
+        self,
+        filename: str,
+        last_hash: str,
+        patch: str,
+        source: Optional[Tuple[FileSystemWatcher, str]] = None,
+    ) -> str:
+        """
+        Apply a patch computed by the client to a file.
+
+        This avoids sending the full content and computing a diff for each
+        small edit. If the file has changed since the client's version, the
+        patch is rejected and the client should fall back to write_file().
+
+        Args:
+            filename: Path to the file relative to repository root
+            last_hash: content_hash() of the content the patch was made against
+            patch: Patch in diff-match-patch text format (patch_toText())
+            source: (watcher, handle) tuple identifying the source of the write
 
-        # Notify watchers after closing to ensure file state is consistent
+        Returns:
+            The new content of the file
+
+        Raises:
+            ValueError: If the path attempts to escape the repository, the file
+                has changed since last_hash, or the patch doesn't apply
+        """
+        file_path = self._normalize_and_validate_path(filename)
+
+        try:
+            current_content = self._get_current_content(filename, file_path)
+        except FileNotFoundError:
+            # File doesn't exist, it will be created
+            current_content = ""
+
+        if content_hash(current_content) != last_hash:
+            raise ValueError(f"File has changed since the patch was made: {filename}")
+
+        patches = self._dmp.patch_fromText(patch)
+        new_content, patch_results = self._dmp.patch_apply(patches, current_content)
+        if not all(patch_results):
+            raise ValueError(f"Patch does not apply to {filename}")
+
+        self._write_and_update(filename, file_path, new_content)
+
+        # Notify watchers after updating to ensure file state is consistent
         self._notify_watchers(filename, new_content, source)
 
         return new_content
@@ -281,37 +602,68 @@ class FileSystem:
         """
         file_path = self._normalize_and_validate_path(filename)
 
-        opened = False
-        try:
-            content = self.open_file(filename)
-            opened = True
-            new_content = edit_function(content)
+        content = self._get_current_content(filename, file_path)
+        new_content = edit_function(content)
 
-            # Write to disk atomically and get mtime
-            mtime = self._write_file_atomic(file_path, new_content)
+        self._write_and_update(filename, file_path, new_content)
 
-            # Update internal state before closing
-            self.files[filename].content = new_content
-            self.files[filename].mtime = mtime
+        # Notify watchers after updating to ensure file state is consistent
+        self._notify_watchers(filename, new_content, None)
 
-        finally:
-            if opened:
-                self.close_file(filename)
+    def _get_current_content(self, filename: str, file_path: Path) -> str:
+        """
+        Get the current content of a working tree file, without opening it.
+
+        Args:
+            filename: Path to the file relative to repository root
+            file_path: Absolute path to the file
 
-        # Notify watchers after closing to ensure file state is consistent
-        if opened:
-            self._notify_watchers(filename, new_content, None)
+        Returns:
+            The tracked content if the file is open, otherwise the content on disk
 
-    def _write_file_atomic(self, file_path: Path, content: str) -> float:
+        Raises:
+            FileNotFoundError: If the file doesn't exist
         """
-        Write a file atomically using a temporary file.
+        file = self.files.get(filename)
+        if file is not None:
+            return file.content
+
+        try:
+            return file_path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            raise FileNotFoundError(f"File not found: {filename}")
+
+    def _write_and_update(self, filename: str, file_path: Path, content: str) -> None:
+        """
+        Write a file to disk, and update its tracked state if it is open.
 
         Args:
+            filename: Path to the file relative to repository root
             file_path: Absolute path to the file
             content: Content to write
+        """
+        # Write to disk atomically and get its stat
+        data = content.encode("utf-8")
+        file_stat = self._write_file_atomic(file_path, data)
+
+        file = self.files.get(filename)
+        if file is not None:
+            file.update_from_disk(file_stat, data)
+
+    def _write_file_atomic(
+        self, file_path: Path, data: bytes, durable: bool = False
+    ) -> os.stat_result:
+        """
+        Write a file atomically using a temporary file.
+
+        Args:
+            file_path: Absolute path to the file
+            data: Encoded content to write
+            durable: If True, fsync the data before returning. Otherwise the
+                file is flushed to disk at the next commit().
 
         Returns:
-            The mtime of the written file
+            The stat of the written file
 
         Raises:
             OSError: If writing fails
@@ -319,31 +671,39 @@ class FileSystem:
         # Ensure parent directories exist
         file_path.parent.mkdir(parents=True, exist_ok=True)
 
-        # Write to temporary file first
+        # Write to temporary file first. Writes happen on the event loop
+        # thread, so a name that is unique per process is enough; a file left
+        # behind by a crashed process with the same pid is just truncated.
         temp_fd = None
-        temp_path = None
+        temp_path = file_path.parent / f".{file_path.name}.{os.getpid()}.tmp"
         try:
-            temp_fd, temp_path = tempfile.mkstemp(
-                suffix=".tmp", prefix=f".{file_path.name}_", dir=file_path.parent
+            temp_fd = os.open(
+                temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC, 0o666
             )
 
             # Write content to temporary file
-            with os.fdopen(temp_fd, "w", encoding="utf-8") as temp_file:
-                temp_file.write(content)
-                temp_file.flush()
-                os.fsync(temp_file.fileno())
+            view = memoryview(data)
+            while view:
+                view = view[os.write(temp_fd, view) :]
+            if durable:
+                os.fsync(temp_fd)
 
+            os.close(temp_fd)
             temp_fd = None  # File descriptor is now closed
 
-            # Get mtime before rename to avoid race condition
+            # Get stat before rename to avoid race condition. rename() keeps
+            # the inode, size and mtime, so when the watcher sees this write
+            # the file state matches what we record and it's ignored unread.
             temp_stat = os.stat(temp_path)
-            mtime = temp_stat.st_mtime
 
             # Atomically rename to final location
             os.rename(temp_path, file_path)
             temp_path = None  # Successfully renamed
 
-            return mtime
+            if not durable:
+                self._unsynced_paths.add(file_path)
+
+            return temp_stat
 
         except Exception:
             # Clean up on error
@@ -375,12 +735,29 @@ class FileSystem:
         Returns:
             The merged content, with failed patches discarded
         """
+        # Trivial merges where one side didn't change; these avoid computing
+        # a diff, which is expensive for large files
+        if new_content == last_content or current_content == new_content:
+            return current_content
+        if current_content == last_content:
+            return new_content
+
         try:
-            # Create diff-match-patch instance
-            dmp = diff_match_patch()
+            dmp = self._dmp
 
             # Create patches representing the changes from last_content to new_content
-            patches = dmp.patch_make(last_content, new_content)
+            if len(last_content) > self.LINE_DIFF_THRESHOLD:
+                # For large files, diff whole lines: each line is mapped to a
+                # single character so the diff works on a much smaller input
+                chars1, chars2, line_array = dmp.diff_linesToChars(
+                    last_content, new_content
+                )
+                diffs = dmp.diff_main(chars1, chars2, False)
+                dmp.diff_charsToLines(diffs, line_array)
+                dmp.diff_cleanupSemantic(diffs)
+                patches = dmp.patch_make(last_content, diffs)
+            else:
+                patches = dmp.patch_make(last_content, new_content)
 
             # Apply the patches to the current content
             result = dmp.patch_apply(patches, current_content)
@@ -406,10 +783,24 @@ class FileSystem:
         content: str,
         source: Optional[Tuple[FileSystemWatcher, str]] = None,
     ) -> None:
-        """Notify all watchers of a file change."""
-        for watcher in self.watchers:
-            if source is not None and watcher == source[0]:
-                watcher.on_file_change(filename, content, source[1])
+        """Notify all watchers interested in a file of a change to it."""
+        source_watcher, source_handle = source if source is not None else (None, None)
+
+        # Normally only per-file subscribers exist, so avoid building a
+        # combined set unless there are watchers for all files too
+        subscribers = self._subscriptions.get(filename)
+        if not self.watchers:
+            watchers = subscribers or ()
+        elif subscribers:
+            watchers = self.watchers | subscribers
+        else:
+            watchers = self.watchers
+
+        # Iterate over a snapshot, since a watcher might subscribe or
+        # unsubscribe in response to a change
+        for watcher in tuple(watchers):
+            if watcher is source_watcher:
+                watcher.on_file_change(filename, content, source_handle)
             else:
                 watcher.on_file_change(filename, content, None)
 
@@ -429,75 +820,207 @@ class FileSystem:
         async def _watch_files() -> None:
             try:
                 async for changes in awatch(
-                    self.repository_path, recursive=True, watch_filter=None
+                    self.repository_path,
+                    recursive=True,
+                    watch_filter=self._working_tree_filter,
                 ):
-                    for change_type, file_path_str in changes:
-                        await self._handle_file_change(change_type, Path(file_path_str))
+                    await self._handle_file_changes(changes)
             except asyncio.CancelledError:
                 # Expected when stopping the watcher
                 pass
 
-        watch_task = asyncio.create_task(_watch_files())
+        async def _watch_head() -> None:
+            try:
+                while True:
+                    await self._watch_head_until_ref_changes()
+            except asyncio.CancelledError:
+                # Expected when stopping the watcher
+                pass
+
+        watch_tasks = [
+            asyncio.create_task(_watch_files()),
+            asyncio.create_task(_watch_head()),
+        ]
         try:
-            # This gives _watch_files() the chance to run until the point awatch()
+            # This gives the watch tasks the chance to run until the point awatch()
             # has set up the necessary inotify watches and suspends itself to wait
             # for events.
             # https://github.com/samuelcolvin/watchfiles/issues/350
             await asyncio.sleep(0)
             yield
         finally:
-            watch_task.cancel()
-            try:
-                await watch_task
-            except asyncio.CancelledError:
-                pass
+            for watch_task in watch_tasks:
+                watch_task.cancel()
+            for watch_task in watch_tasks:
+                try:
+                    await watch_task
+                except asyncio.CancelledError:
+                    pass
+
+    async def _watch_head_until_ref_changes(self) -> None:
+        """
+        Watch HEAD and the current ref file, returning when HEAD starts
+        pointing to a different ref file so the watch can be set up again.
+        """
+        ref_file = self._current_ref_file
+
+        # Watch the directories non-recursively, since git replaces the files
+        # with a rename. The .git directory holds HEAD and packed-refs.
+        watch_paths = {self._git_head_file.parent}
+        ref_watch_dir = None
+        if ref_file is not None:
+            ref_watch_dir = self._ref_watch_dir(ref_file)
+            watch_paths.add(ref_watch_dir)
+
+        async with aclosing(
+            awatch(*watch_paths, recursive=False, watch_filter=self._head_filter)
+        ) as head_changes:
+            async for _ in head_changes:
+                logger.debug("Detected change to git HEAD, checking HEAD changes")
+                changed = await self._check_head_changes()
+                logger.debug("HEAD change check result: %s", changed)
+
+                if self._current_ref_file != ref_file:
+                    return
+                # A directory on the way to the ref file was created, so the
+                # ref file's own directory can be watched now
+                if (
+                    ref_file is not None
+                    and self._ref_watch_dir(ref_file) != ref_watch_dir
+                ):
+                    return
+
+    def _ref_watch_dir(self, ref_file: Path) -> Path:
+        """
+        Find the directory to watch for changes to a ref file: the directory
+        containing it, or if that doesn't exist yet (the first branch in a
+        new namespace), its nearest ancestor that does.
+        """
+        git_dir = self._git_head_file.parent
+        directory = ref_file.parent
+        while directory != git_dir and not directory.is_dir():
+            directory = directory.parent
+        return directory
+
+    def _working_tree_filter(self, change: Change, path: str) -> bool:
+        """
+        Filter for awatch() that only passes events for tracked files.
+
+        The inotify watches can't be avoided (watches are recursive over the
+        whole repository), but this keeps routine activity - git objects, the
+        index, lock files, our own temporary files, files nobody has open -
+        from waking up the change handler. HEAD changes are picked up by a
+        separate watch.
+
+        awatch() applies the filter on the event loop thread, so reading
+        self.files here is safe.
+        """
+        git_dir = self._git_dir_str
+        if path.startswith(git_dir) and (
+            len(path) == len(git_dir) or path[len(git_dir)] == os.sep
+        ):
+            return False
+
+        prefix = self._repository_prefix
+        return path.startswith(prefix) and path[len(prefix) :] in self.files
+
+    def _head_filter(self, change: Change, path: str) -> bool:
+        """
+        Filter for awatch() that only passes HEAD, packed-refs, the current ref
+        file, and directories being created on the way to the ref file.
+        """
+        if path == self._git_head_file_str or path == self._packed_refs_file_str:
+            return True
+
+        if self._current_ref_file is None:
+            return False
+        ref_file_str = str(self._current_ref_file)
+        return path == ref_file_str or ref_file_str.startswith(path + os.sep)
 
-    async def _handle_file_change(self, change_type: Change, file_path: Path) -> None:
+    async def _handle_file_changes(self, changes: Set[Tuple[Change, str]]) -> None:
         """
-        Handle a single file change event.
+        Handle a batch of file change events from the watcher.
+
+        Stats and reads for tracked files are done concurrently in a thread
+        pool so that a burst of changes (e.g. a git checkout) doesn't block
+        the event loop.
 
         Args:
-            change_type: The type of change (added, modified, deleted)
-            file_path: Absolute path to the changed file
+            changes: Set of (change type, absolute path) tuples
         """
-        try:
+        batch: Dict[str, str] = {}
+
+        # Plain string operations rather than Path objects, since most
+        # events are for files we aren't tracking
+        prefix = self._repository_prefix
+
+        for _, file_path_str in changes:
             # Convert absolute path to relative path within repository
-            try:
-                relative_path = file_path.relative_to(self.repository_path)
-                filename = str(relative_path)
-            except ValueError:
+            if not file_path_str.startswith(prefix):
                 # File is outside repository, ignore
-                return
+                continue
+            filename = file_path_str[len(prefix) :]
 
-            # Handle .git directory changes for HEAD tracking
-            if filename.startswith(".git/") or filename == ".git":
-                # Check if this is a change to HEAD or the current ref file
-                if file_path == self._git_head_file or (
-                    self._current_ref_file and file_path == self._current_ref_file
-                ):
-                    # Check for HEAD changes
-                    logger.debug(
-                        "Detected change to git file %s, checking HEAD changes",
-                        file_path,
-                    )
-                    changed = self._check_head_changes()
-                    logger.debug("HEAD change check result: %s", changed)
-                return
+            # Only process files that are currently being tracked. Multiple
+            # events for a file collapse into one entry; whether it was
+            # modified or deleted is decided by stat(), not the event type,
+            # since that reflects the final state rather than the sequence.
+            if filename in self.files:
+                batch[filename] = file_path_str
 
-            # Only process files that are currently being tracked
-            if filename not in self.files:
-                return
+        if not batch:
+            return
 
-            if change_type == Change.deleted:
-                # File was deleted
-                await self._handle_file_deletion(filename)
-            elif change_type in (Change.added, Change.modified):
-                # File was added or modified
-                await self._handle_file_modification(filename, file_path)
+        # Snapshot the file states so we can tell if a file was written by us
+        # while its read was in progress
+        filenames = list(batch)
+        known_states = [self.files[filename].state for filename in filenames]
+
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    self._io_executor,
+                    _stat_and_read,
+                    batch[filename],
+                    state,
+                    self.files[filename].data,
+                )
+                for filename, state in zip(filenames, known_states)
+            ),
+            return_exceptions=True,
+        )
 
-        except Exception:
-            # Log error but continue processing other changes
-            logger.exception("Error handling file change for %s", file_path)
+        for filename, known_state, result in zip(filenames, known_states, results):
+            try:
+                file = self.files.get(filename)
+                if file is None or file.state != known_state:
+                    # Closed or rewritten while we were reading
+                    continue
+
+                if isinstance(result, FileNotFoundError):
+                    # File was moved or deleted
+                    await self._handle_file_deletion(filename)
+                elif isinstance(result, (OSError, UnicodeDecodeError)):
+                    # Error reading file, might be temporarily inaccessible
+                    logger.error(
+                        "Error reading modified file %s",
+                        filename,
+                        exc_info=result,
+                    )
+                elif isinstance(result, BaseException):
+                    raise result
+                elif result is not None:
+                    file_stat, data, new_content = result
+                    file.update_from_disk(file_stat, data)
+
+                    if new_content is not None:
+                        # Notify watchers of the change
+                        self._notify_watchers(filename, new_content, None)
+
+            except Exception:
+                # Log error but continue processing other changes
+                logger.exception("Error handling file change for %s", filename)
 
     async def _handle_file_deletion(self, filename: str) -> None:
         """
@@ -515,43 +1038,6 @@ class FileSystem:
             # Notify watchers that the file was deleted (with empty content)
             self._notify_watchers(filename, "", None)
 
-    async def _handle_file_modification(self, filename: str, file_path: Path) -> None:
-        """
-        Handle modification of a tracked file.
-
-        Args:
-            filename: Relative path of the modified file
-            file_path: Absolute path to the modified file
-        """
-        if not file_path.exists():
-            # File was moved or deleted between detection and processing
-            await self._handle_file_deletion(filename)
-            return
-
-        try:
-            # Get current file stats
-            file_stat = file_path.stat()
-            current_mtime = file_stat.st_mtime
-
-            # Check if mtime actually changed
-            if filename in self.files and self.files[filename].mtime == current_mtime:
-                return  # No actual change
-
-            # Read the new content
-            new_content = file_path.read_text(encoding="utf-8")
-
-            # Update our internal state
-            if filename in self.files:
-                self.files[filename].content = new_content
-                self.files[filename].mtime = current_mtime
-
-                # Notify watchers of the change
-                self._notify_watchers(filename, new_content, None)
-
-        except (OSError, UnicodeDecodeError):
-            # Error reading file, might be temporarily inaccessible
-            logger.exception("Error reading modified file %s", filename)
-
     def _is_committed_file_path(self, filename: str) -> bool:
         """Check if filename uses @file syntax for committed versions."""
         return filename.startswith("@")
@@ -573,27 +1059,86 @@ class FileSystem:
         Returns:
             Content of the file in the specified revision
 
+        Raises:
+            FileNotFoundError: If file doesn't exist in the revision
+            ValueError: If revision is invalid
+        """
+        blob_oid = self._lookup_git_blob(git_file_path, revision)
+        return self._read_blob(blob_oid).decode("utf-8")
+
+    def _lookup_git_blob(self, git_file_path: str, revision: str = "HEAD") -> str:
+        """
+        Find the blob for a file in a specific git revision without reading it.
+
+        Args:
+            git_file_path: Path to the file within the git repository
+            revision: Git revision (default: HEAD)
+
+        Returns:
+            Hex OID of the file's blob
+
         Raises:
             FileNotFoundError: If file doesn't exist in the revision
             ValueError: If revision is invalid
         """
         try:
-            result = subprocess.run(
-                ["git", "cat-file", "blob", f"{revision}:{git_file_path}"],
-                cwd=self.repository_path,
-                capture_output=True,
-                text=True,
-                check=True,
-            )
-            return result.stdout
-        except subprocess.CalledProcessError as e:
-            if "does not exist" in e.stderr or "not in the working tree" in e.stderr:
+            commit = self._repo.revparse_single(revision).peel(pygit2.Commit)
+        except (KeyError, ValueError, pygit2.GitError):
+            if revision == "HEAD" and self._repo.head_is_unborn:
+                # No commits yet, so nothing has been committed
                 raise FileNotFoundError(f"File not found in git: @{git_file_path}")
-            elif "bad revision" in e.stderr or "unknown revision" in e.stderr:
-                raise ValueError(f"Invalid git revision: {revision}")
-            else:
-                # Re-raise with original error for unexpected cases
-                raise
+            raise ValueError(f"Invalid git revision: {revision}")
+
+        try:
+            entry = commit.tree[git_file_path]
+        except KeyError:
+            raise FileNotFoundError(f"File not found in git: @{git_file_path}")
+
+        if entry.type != ObjectType.BLOB:
+            raise FileNotFoundError(f"File not found in git: @{git_file_path}")
+
+        return str(entry.id)
+
+    def _read_blob(self, blob_oid: str) -> bytes:
+        """
+        Read the content of a git blob, using the in-memory cache if possible.
+
+        Args:
+            blob_oid: Hex OID of the blob
+
+        Returns:
+            The raw blob content
+        """
+        data = self._get_cached_blob(blob_oid)
+        if data is None:
+            data = self._repo[blob_oid].data
+            self._cache_blob(blob_oid, data)
+
+        return data
+
+    def _get_cached_blob(self, blob_oid: str) -> Optional[bytes]:
+        """Look up a blob in the cache, marking it as recently used."""
+        data = self._blob_cache.get(blob_oid)
+        if data is not None:
+            self._blob_cache.move_to_end(blob_oid)
+        return data
+
+    def _cache_blob(self, blob_oid: str, data: bytes) -> None:
+        """Add a blob to the cache, evicting the least recently used."""
+        self._blob_cache[blob_oid] = data
+        if len(self._blob_cache) > self.BLOB_CACHE_SIZE:
+            self._blob_cache.popitem(last=False)
+
+    def _load_blob(self, blob_oid: str) -> bytes:
+        """
+        Read a blob from the repository in a worker thread, using a repository
+        handle private to that thread.
+        """
+        repo = getattr(self._thread_repos, "repo", None)
+        if repo is None:
+            repo = pygit2.Repository(str(self.repository_path))
+            self._thread_repos.repo = repo
+        return repo[blob_oid].data
 
     def commit(self, message: str) -> None:
         """
@@ -605,36 +1150,92 @@ class FileSystem:
         Raises:
             RuntimeError: If git commands fail
         """
+        unsynced_paths = self._take_unsynced_paths()
         try:
-            # Stage all changes (respects .gitignore)
-            subprocess.run(
-                ["git", "add", "-A"],
-                cwd=self.repository_path,
-                check=True,
-                capture_output=True,
-            )
+            self._commit(message, unsynced_paths)
+        except BaseException:
+            self._unsynced_paths |= unsynced_paths
+            raise
+
+    async def commit_async(self, message: str) -> None:
+        """
+        Commit all changes to the git repository, without blocking the event
+        loop while scanning the working tree and writing objects.
+
+        Args:
+            message: Commit message
+
+        Raises:
+            RuntimeError: If git commands fail
+        """
+        unsynced_paths = self._take_unsynced_paths()
+        try:
+            await asyncio.to_thread(self._commit, message, unsynced_paths)
+        except BaseException:
+            self._unsynced_paths |= unsynced_paths
+            raise
+
+    def _take_unsynced_paths(self) -> Set[Path]:
+        """Return the files written since the last commit, and forget them."""
+        unsynced_paths = self._unsynced_paths
+        self._unsynced_paths = set()
+        return unsynced_paths
+
+    def _commit(self, message: str, unsynced_paths: Set[Path]) -> None:
+        """
+        Implementation of commit(). Safe to call from a worker thread.
+
+        Args:
+            message: Commit message
+            unsynced_paths: Files written since the last commit, to be
+                flushed to disk before committing
+
+        Raises:
+            RuntimeError: If git commands fail
+        """
+        try:
+            # Use a separate repository handle, so that commit_async() can
+            # run this in a worker thread without sharing self._repo
+            repo = pygit2.Repository(str(self.repository_path))
+
+            # Make sure what we're committing has actually reached the disk
+            _sync_files(unsynced_paths)
+
+            # Stage all changes (status() already leaves out ignored files)
+            index = repo.index
+            for path, flags in repo.status().items():
+                if flags & FileStatus.WT_DELETED:
+                    index.remove(path)
+                elif flags & (
+                    FileStatus.WT_NEW
+                    | FileStatus.WT_MODIFIED
+                    | FileStatus.WT_TYPECHANGE
+                ):
+                    index.add(path)
+            index.write()
+            tree_id = index.write_tree()
+
+            if repo.head_is_unborn:
+                if len(index) == 0:
+                    # Nothing to commit - this is not an error
+                    return
+                parents = []
+            else:
+                head_commit = repo.head.peel(pygit2.Commit)
+                if head_commit.tree_id == tree_id:
+                    # Nothing to commit - this is not an error
+                    return
+                parents = [head_commit.id]
 
             # Create the commit
-            subprocess.run(
-                ["git", "commit", "-m", message],
-                cwd=self.repository_path,
-                check=True,
-                capture_output=True,
-            )
+            signature = repo.default_signature
+            repo.create_commit("HEAD", signature, signature, message, tree_id, parents)
 
             # Notify watchers about the successful commit
             # This will be enhanced when we add HEAD change detection
 
-        except subprocess.CalledProcessError as e:
-            # Handle the case where there's nothing to commit
-            if (
-                "nothing to commit" in e.stdout.decode()
-                or "nothing to commit" in e.stderr.decode()
-            ):
-                # This is not an error - just means no changes were made
-                pass
-            else:
-                raise RuntimeError(f"Git commit failed: {e.stderr.decode()}")
+        except (pygit2.GitError, KeyError, OSError) as e:
+            raise RuntimeError(f"Git commit failed: {e}")
 
     def _resolve_head_commit(self) -> tuple[str, Optional[Path]]:
         """
@@ -645,6 +1246,19 @@ class FileSystem:
             is the file that should be monitored for changes to this commit
         """
         try:
+            # Stat before reading, so that a change made while we read
+            # invalidates the cache entry
+            head_key = _stat_key(self._git_head_file)
+
+            # Reuse the last result if neither HEAD nor the ref changed
+            if self._head_cache is not None and self._head_cache[0] == head_key:
+                _, ref_key, packed_key, commit_hash, ref_file = self._head_cache
+                if ref_file == self._git_head_file or (
+                    _stat_key(ref_file) == ref_key
+                    and _stat_key(self._packed_refs_file) == packed_key
+                ):
+                    return commit_hash, ref_file
+
             # Read HEAD file
             head_content = self._git_head_file.read_text().strip()
 
@@ -652,21 +1266,54 @@ class FileSystem:
                 # HEAD points to a ref (branch) - read the ref file
                 ref_path = head_content[5:]  # Remove "ref: " prefix
                 ref_file = self.repository_path / ".git" / ref_path
+                ref_key = _stat_key(ref_file)
+                packed_key = _stat_key(self._packed_refs_file)
 
                 try:
                     commit_hash = ref_file.read_text().strip()
-                    return commit_hash, ref_file
                 except FileNotFoundError:
-                    # Ref doesn't exist yet (new repository)
-                    return "", ref_file
+                    # Not a loose ref: it may have been packed, or not exist
+                    # yet (new repository)
+                    commit_hash = self._read_packed_ref(ref_path)
             else:
                 # HEAD points directly to a commit (detached) - use HEAD content
-                return head_content, self._git_head_file
+                ref_file = self._git_head_file
+                ref_key = head_key
+                packed_key = None
+                commit_hash = head_content
+
+            self._head_cache = (head_key, ref_key, packed_key, commit_hash, ref_file)
+            return commit_hash, ref_file
 
         except (OSError, FileNotFoundError):
             # Git repository might be in an unusual state
             return "", self._git_head_file
 
+    def _read_packed_ref(self, ref_path: str) -> str:
+        """
+        Look up a ref in .git/packed-refs.
+
+        Args:
+            ref_path: Name of the ref, e.g. refs/heads/main
+
+        Returns:
+            The commit hash, or "" if the ref isn't packed
+        """
+        try:
+            packed_refs = self._packed_refs_file.read_text()
+        except FileNotFoundError:
+            return ""
+
+        for line in packed_refs.splitlines():
+            # Skip the header and the peeled values of annotated tags
+            if line.startswith(("#", "^")):
+                continue
+            commit_hash, _, name = line.partition(" ")
+            if name == ref_path:
+                return commit_hash
+
+        return ""
+
     def _initialize_head_tracking(self) -> None:
         """Initialize HEAD tracking by resolving current commit."""
         try:
@@ -678,7 +1325,7 @@ class FileSystem:
             self._current_head_commit = None
             self._current_ref_file = None
 
-    def _check_head_changes(self) -> bool:
+    async def _check_head_changes(self) -> bool:
         """
         Check if HEAD has changed by re-resolving and comparing.
 
@@ -688,13 +1335,20 @@ class FileSystem:
         try:
             new_head_commit, new_ref_file = self._resolve_head_commit()
 
+            # HEAD may point to a new branch at the same commit; the new ref
+            # file needs to be watched even though nothing else changed
+            self._current_ref_file = new_ref_file
+
             if new_head_commit != self._current_head_commit:
+                changed_paths = self._diff_commits(
+                    self._current_head_commit, new_head_commit
+                )
+
                 # HEAD changed - update tracking and committed files
                 self._current_head_commit = new_head_commit
-                self._current_ref_file = new_ref_file
 
-                # Update all open committed files
-                self._update_committed_files()
+                # Update the open committed files touched by the change
+                await self._update_committed_files(changed_paths)
 
                 return True
 
@@ -703,32 +1357,139 @@ class FileSystem:
 
         return False
 
-    def _update_committed_files(self) -> None:
-        """Update all open committed files to reflect the current HEAD."""
-        committed_files = [
-            filename
-            for filename in self.files.keys()
-            if self._is_committed_file_path(filename)
-        ]
+    def _diff_commits(
+        self, old_commit: Optional[str], new_commit: str
+    ) -> Optional[Set[str]]:
+        """
+        Find the paths that differ between two commits.
 
-        for filename in committed_files:
-            try:
-                git_file_path = self._extract_git_file_path(filename)
-                old_content = self.files[filename].content
+        Args:
+            old_commit: Hash of the previous commit, if known
+            new_commit: Hash of the new commit
 
-                try:
-                    new_content = self._read_file_from_git(git_file_path)
-                except FileNotFoundError:
-                    # File was deleted in the new commit
-                    new_content = ""
+        Returns:
+            Set of changed paths, or None if either commit can't be resolved
+            and all files need to be checked
+        """
+        if not old_commit or not new_commit:
+            return None
 
-                # Only notify watchers if content actually changed
-                if new_content != old_content:
-                    # Update internal state
-                    self.files[filename].content = new_content
+        try:
+            old_tree = self._repo[old_commit].peel(pygit2.Tree)
+            new_tree = self._repo[new_commit].peel(pygit2.Tree)
+        except (KeyError, ValueError, pygit2.GitError):
+            return None
 
-                    # Notify watchers
-                    self._notify_watchers(filename, new_content, None)
+        changed_paths = set()
+        for delta in self._repo.diff(old_tree, new_tree).deltas:
+            changed_paths.add(delta.old_file.path)
+            changed_paths.add(delta.new_file.path)
 
-            except Exception:
-                logger.exception("Error updating committed file %s", filename)
+        return changed_paths
+
+    async def _update_committed_files(
+        self, changed_paths: Optional[Set[str]] = None
+    ) -> None:
+        """
+        Update open committed files to reflect the current HEAD.
+
+        Blobs that aren't cached are read concurrently in a thread pool.
+
+        Args:
+            changed_paths: Paths changed by the HEAD update; if None, all
+                open committed files are checked
+        """
+        # Updates are serialized so that a slow update can't overwrite
+        # the results of one for a later HEAD
+        async with self._committed_files_lock:
+            committed_files = [
+                filename
+                for filename in self.files.keys()
+                if self._is_committed_file_path(filename)
+                and (
+                    changed_paths is None
+                    or self._extract_git_file_path(filename) in changed_paths
+                )
+            ]
+
+            # Find the new blobs; this only needs tree lookups
+            new_blob_oids: Dict[str, Optional[str]] = {}
+            for filename in committed_files:
+                try:
+                    git_file_path = self._extract_git_file_path(filename)
+                    try:
+                        new_blob_oid = self._lookup_git_blob(git_file_path)
+                    except FileNotFoundError:
+                        # File was deleted in the new commit
+                        new_blob_oid = None
+
+                    # Same blob means same content, no need to read it
+                    if new_blob_oid != self.files[filename].blob_oid:
+                        new_blob_oids[filename] = new_blob_oid
+
+                except Exception:
+                    logger.exception("Error updating committed file %s", filename)
+
+            # Get the new blobs from the cache, and read the rest
+            blobs: Dict[str, bytes] = {}
+            to_read: List[str] = []
+            for blob_oid in set(new_blob_oids.values()):
+                if blob_oid is not None:
+                    data = self._get_cached_blob(blob_oid)
+                    if data is not None:
+                        blobs[blob_oid] = data
+                    else:
+                        to_read.append(blob_oid)
+
+            if to_read:
+                loop = asyncio.get_running_loop()
+                results = await asyncio.gather(
+                    *(
+                        loop.run_in_executor(
+                            self._io_executor, self._load_blob, blob_oid
+                        )
+                        for blob_oid in to_read
+                    ),
+                    return_exceptions=True,
+                )
+                for blob_oid, result in zip(to_read, results):
+                    if isinstance(result, BaseException):
+                        logger.error(
+                            "Error reading git blob %s", blob_oid, exc_info=result
+                        )
+                    else:
+                        blobs[blob_oid] = result
+                        self._cache_blob(blob_oid, result)
+
+            for filename, new_blob_oid in new_blob_oids.items():
+                try:
+                    file = self.files.get(filename)
+                    if file is None:
+                        # Closed while we were reading
+                        continue
+
+                    if new_blob_oid is None:
+                        new_data = b""
+                    elif new_blob_oid in blobs:
+                        new_data = blobs[new_blob_oid]
+                    else:
+                        # Error reading, already logged
+                        continue
+                    old_blob_oid = file.blob_oid
+                    file.blob_oid = new_blob_oid
+
+                    # Only notify watchers if content actually changed. Blob
+                    # OIDs are content hashes, so different blobs always have
+                    # different content; only a deleted file may look the
+                    # same as an empty one, and needs a content comparison.
+                    if (
+                        old_blob_oid is not None and new_blob_oid is not None
+                    ) or new_data != file.data:
+                        # Update internal state
+                        file.data = new_data
+
+                        # Notify watchers
+                        self._notify_watchers(filename, new_data.decode("utf-8"), None)
+
+                except Exception:
+                    logger.exception("Error updating committed file %s", filename)
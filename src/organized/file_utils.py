@@ -0,0 +1,24 @@
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, TextIO
+
+
+@contextmanager
+def atomic_write(path: Path) -> Iterator[TextIO]:
+    """
+    Opens a temporary file next to path for writing text. If the block
+    completes without an exception, the temporary file replaces path, so
+    that path never holds a partial write; otherwise it is removed.
+    """
+    # Callers may run in threads, so the name must be unique per thread
+    temp_path = path.parent / f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC, 0o666)
+    try:
+        with open(fd, "w", encoding="utf-8") as f:
+            yield f
+        os.replace(temp_path, path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
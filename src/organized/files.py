@@ -6,22 +6,54 @@ in FILESYSTEM_DESIGN.md Phase 5.
 """
 
 import asyncio
-from typing import Dict, Optional
+import contextlib
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Union
 from pathlib import Path
 
+import orjson
 from fastapi import APIRouter, Depends, WebSocketDisconnect
 from fastapi.websockets import WebSocket
 
 from .file_system import FileSystem, FileSystemWatcher
 from .tasks import GIT_CHECKOUT_LOCATION, ensure_git_repo
 
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class _FileUpdate:
+    """A queued file_updated event, replaced in place by newer content."""
+
+    handle: str
+    encoded_content: bytes  # JSON-encoded string
+
+    def encode(self) -> bytes:
+        return (
+            b'{"type":"file_updated","handle":'
+            + orjson.dumps(self.handle)
+            + b',"content":'
+            + self.encoded_content
+            + b"}"
+        )
+
 
 class Connection(FileSystemWatcher):
     """
     Manages a single WebSocket connection and its file subscriptions.
     Acts as both a context manager and a FileSystemWatcher.
+
+    Outgoing messages go through a queue drained by a single writer task,
+    so they are delivered in the order they were produced. A file_updated
+    event that hasn't been sent yet is updated with newer content rather
+    than queueing another one, as long as nothing else for that handle was
+    queued after it.
     """
 
+    # Maximum number of messages waiting to be sent
+    OUTBOX_SIZE = 1024
+
     def __init__(self, websocket: WebSocket, file_system: FileSystem):
         self.websocket = websocket
         self.file_system = file_system
@@ -29,22 +61,83 @@ class Connection(FileSystemWatcher):
         self.open_handles: Dict[str, str] = {}
         # Track files to handles: {filename: set of handles}
         self.file_handles: Dict[str, set] = {}
+        self._outbox: asyncio.Queue[Union[dict, _FileUpdate]] = asyncio.Queue(
+            maxsize=self.OUTBOX_SIZE
+        )
+        # The last queued message for these handles is a file_updated event
+        self._pending_updates: Dict[str, _FileUpdate] = {}
+        self._writer: Optional[asyncio.Task] = None
 
     async def __aenter__(self):
         """Async context manager entry."""
         await self.websocket.accept()
-        self.file_system.add_watcher(self)
+        self._writer = asyncio.create_task(self._drain_outbox())
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit - cleanup all resources."""
-        # Close all files opened by this connection
+        if self._writer is not None:
+            self._writer.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._writer
+            self._writer = None
+
+        # Close all files opened by this connection and stop watching them
         for filename, handles in list(self.file_handles.items()):
-            for _ in handles:
-                self.file_system.close_file(filename)
+            self.file_system.unsubscribe(self, filename)
+            self.file_system.close_file(filename, count=len(handles))
+
+    async def send_json(self, message: dict) -> None:
+        """Queue a JSON message to be sent to the WebSocket connection."""
+        handle = message.get("handle")
+        if handle is not None:
+            # Later updates must not overtake this message
+            self._pending_updates.pop(handle, None)
+        await self._outbox.put(message)
+
+    async def send_error(self, message: str, path: Optional[str] = None) -> None:
+        """Queue an error event to be sent to the WebSocket connection."""
+        error = {"type": "error", "message": message}
+        if path is not None:
+            error["path"] = path
+        await self.send_json(error)
+
+    async def _drain_outbox(self) -> None:
+        """
+        Send queued messages to the WebSocket connection.
 
-        # Remove this watcher from the file system
-        self.file_system.remove_watcher(self)
+        File contents can be large, so this uses orjson rather than the
+        json module that WebSocket.send_json() goes through.
+        """
+        while True:
+            message = await self._outbox.get()
+            if isinstance(message, _FileUpdate):
+                if self._pending_updates.get(message.handle) is message:
+                    del self._pending_updates[message.handle]
+                data = message.encode()
+            else:
+                data = orjson.dumps(message)
+            try:
+                await self.websocket.send_text(data.decode("utf-8"))
+            except Exception:
+                # Connection might be closed, ignore the error
+                pass
+
+    async def receive_json(self) -> dict:
+        """
+        Receive a JSON message from the WebSocket connection.
+
+        Commands may come in text or binary frames; a binary frame is parsed
+        straight from the bytes, without decoding it to a string first.
+        """
+        message = await self.websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+
+        data = message.get("text")
+        if data is None:
+            data = message["bytes"]
+        return orjson.loads(data)
 
     def on_file_change(self, filename: str, content: str, source_handle: Optional[str] = None) -> None:
         """
@@ -53,23 +146,35 @@ class Connection(FileSystemWatcher):
         """
         if filename in self.file_handles:
             # Send file_updated to all handles except the source handle
-            for handle in self.file_handles[filename]:
-                if handle != source_handle:
-                    asyncio.create_task(self._send_file_updated(handle, content))
-
-    async def _send_file_updated(self, handle: str, content: str):
-        """Send file_updated event to the WebSocket connection."""
+            targets = [h for h in self.file_handles[filename] if h != source_handle]
+            if not targets:
+                # The change came from our only handle for the file
+                return
+
+            # The content is the same for every handle, so only encode it once
+            encoded_content = orjson.dumps(content)
+            for handle in targets:
+                self._send_file_updated(handle, encoded_content)
+
+    def _send_file_updated(self, handle: str, encoded_content: bytes):
+        """Queue a file_updated event for the WebSocket connection."""
+        update = self._pending_updates.get(handle)
+        if update is not None:
+            # Not sent yet, so the client never needs to see the old content
+            update.encoded_content = encoded_content
+            return
+
+        update = _FileUpdate(handle, encoded_content)
         try:
-            await self.websocket.send_json({
-                "type": "file_updated",
-                "handle": handle,
-                "content": content
-            })
-        except Exception:
-            # Connection might be closed, ignore the error
-            pass
-
-    def open_file(self, filename: str, handle: str) -> str:
+            self._outbox.put_nowait(update)
+        except asyncio.QueueFull:
+            # The client isn't reading; it will be out of date until it
+            # reopens the file
+            logger.warning("Dropping file_updated for %s: outbox full", handle)
+            return
+        self._pending_updates[handle] = update
+
+    async def open_file(self, filename: str, handle: str) -> str:
         """
         Open a file with a specific handle and track it for this connection.
         Returns the file content.
@@ -78,12 +183,14 @@ class Connection(FileSystemWatcher):
             raise ValueError(f"Handle '{handle}' is already in use")
 
         # Open the file in the file system first
-        content = self.file_system.open_file(filename)
+        content = await self.file_system.open_file_async(filename)
 
         # Track the handle
         self.open_handles[handle] = filename
         if filename not in self.file_handles:
             self.file_handles[filename] = set()
+            # Only get notified about files we have open
+            self.file_system.subscribe(self, filename)
         self.file_handles[filename].add(handle)
 
         return content
@@ -103,6 +210,7 @@ class Connection(FileSystemWatcher):
         self.file_handles[filename].remove(handle)
         if not self.file_handles[filename]:
             del self.file_handles[filename]
+            self.file_system.unsubscribe(self, filename)
 
         # Close in the file system
         self.file_system.close_file(filename)
@@ -139,7 +247,7 @@ async def websocket_endpoint(websocket: WebSocket, fs: FileSystem = Depends(get_
     async with Connection(websocket, fs) as connection:
         try:
             while True:
-                data = await websocket.receive_json()
+                data = await connection.receive_json()
                 await handle_command(connection, data)
                 
         except WebSocketDisconnect:
@@ -152,24 +260,13 @@ async def handle_command(connection: Connection, data: dict):
     command_type = data.get("type")
     
     try:
-        if command_type == "open_file":
-            await handle_open_file(connection, data)
-        elif command_type == "close_file":
-            await handle_close_file(connection, data)
-        elif command_type == "write_file":
-            await handle_write_file(connection, data)
-        elif command_type == "commit":
-            await handle_commit(connection, data)
+        handler = COMMAND_HANDLERS.get(command_type)
+        if handler is not None:
+            await handler(connection, data)
         else:
-            await connection.websocket.send_json({
-                "type": "error",
-                "message": f"Unknown command type: {command_type}"
-            })
+            await connection.send_error(f"Unknown command type: {command_type}")
     except Exception as e:
-        await connection.websocket.send_json({
-            "type": "error",
-            "message": str(e)
-        })
+        await connection.send_error(str(e))
 
 
 async def handle_open_file(connection: Connection, data: dict):
@@ -178,35 +275,25 @@ async def handle_open_file(connection: Connection, data: dict):
     handle = data.get("handle")
 
     if not path:
-        await connection.websocket.send_json({
-            "type": "error",
-            "message": "Missing required field: path"
-        })
+        await connection.send_error("Missing required field: path")
         return
 
     if not handle:
-        await connection.websocket.send_json({
-            "type": "error",
-            "message": "Missing required field: handle"
-        })
+        await connection.send_error("Missing required field: handle")
         return
 
     try:
         # Open the file with the handle
-        content = connection.open_file(path, handle)
+        content = await connection.open_file(path, handle)
 
-        await connection.websocket.send_json({
+        await connection.send_json({
             "type": "file_opened",
             "path": path,
             "handle": handle,
             "content": content
         })
     except Exception as e:
-        await connection.websocket.send_json({
-            "type": "error",
-            "path": path,
-            "message": str(e)
-        })
+        await connection.send_error(str(e), path=path)
 
 
 async def handle_close_file(connection: Connection, data: dict):
@@ -214,25 +301,19 @@ async def handle_close_file(connection: Connection, data: dict):
     handle = data.get("handle")
 
     if not handle:
-        await connection.websocket.send_json({
-            "type": "error",
-            "message": "Missing required field: handle"
-        })
+        await connection.send_error("Missing required field: handle")
         return
 
     try:
         # Close the file handle
         filename = connection.close_file(handle)
 
-        await connection.websocket.send_json({
+        await connection.send_json({
             "type": "file_closed",
             "handle": handle
         })
     except Exception as e:
-        await connection.websocket.send_json({
-            "type": "error",
-            "message": str(e)
-        })
+        await connection.send_error(str(e))
 
 
 async def handle_write_file(connection: Connection, data: dict):
@@ -242,17 +323,11 @@ async def handle_write_file(connection: Connection, data: dict):
     new_content = data.get("new_content", "")
 
     if not handle:
-        await connection.websocket.send_json({
-            "type": "error",
-            "message": "Missing required field: handle"
-        })
+        await connection.send_error("Missing required field: handle")
         return
 
     if not connection.is_handle_valid(handle):
-        await connection.websocket.send_json({
-            "type": "error",
-            "message": "Invalid handle"
-        })
+        await connection.send_error("Invalid handle")
         return
 
     try:
@@ -261,31 +336,62 @@ async def handle_write_file(connection: Connection, data: dict):
             filename, last_content, new_content, source=(connection, handle)
         )
 
-        await connection.websocket.send_json({
+        await connection.send_json({
             "type": "file_written",
             "handle": handle,
             "content": result_content
         })
     except Exception as e:
-        await connection.websocket.send_json({
-            "type": "error",
-            "message": str(e)
+        await connection.send_error(str(e))
+
+
+async def handle_patch_file(connection: Connection, data: dict):
+    """Handle patch_file command."""
+    handle = data.get("handle")
+    last_hash = data.get("last_hash")
+    patch = data.get("patch")
+
+    if not handle:
+        await connection.send_error("Missing required field: handle")
+        return
+
+    if not last_hash:
+        await connection.send_error("Missing required field: last_hash")
+        return
+
+    if not patch:
+        await connection.send_error("Missing required field: patch")
+        return
+
+    if not connection.is_handle_valid(handle):
+        await connection.send_error("Invalid handle")
+        return
+
+    try:
+        filename = connection.open_handles[handle]
+        result_content = connection.file_system.patch_file(
+            filename, last_hash, patch, source=(connection, handle)
+        )
+
+        await connection.send_json({
+            "type": "file_written",
+            "handle": handle,
+            "content": result_content
         })
+    except Exception as e:
+        await connection.send_error(str(e))
 
 
 async def handle_commit(connection: Connection, data: dict):
     """Handle commit command."""
     message = data.get("message", "")
     if not message:
-        await connection.websocket.send_json({
-            "type": "error",
-            "message": "Missing required field: message"
-        })
+        await connection.send_error("Missing required field: message")
         return
     
     try:
-        connection.file_system.commit(message)
-        await connection.websocket.send_json({
+        await connection.file_system.commit_async(message)
+        await connection.send_json({
             "type": "committed"
         })
         
@@ -294,7 +400,14 @@ async def handle_commit(connection: Connection, data: dict):
         # For now, we'll leave this as a TODO as it requires more complex logic
         
     except Exception as e:
-        await connection.websocket.send_json({
-            "type": "error",
-            "message": str(e)
-        })
\ No newline at end of file
+        await connection.send_error(str(e))
+
+
+# Command type => handler, used by handle_command()
+COMMAND_HANDLERS: Dict[str, Callable[[Connection, dict], Awaitable[None]]] = {
+    "open_file": handle_open_file,
+    "close_file": handle_close_file,
+    "write_file": handle_write_file,
+    "patch_file": handle_patch_file,
+    "commit": handle_commit,
+}
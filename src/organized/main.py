@@ -1,12 +1,18 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 
 from . import notes
-from .chat import router as chat_router
+from .chat import router as chat_router, get_agent, warm_agent
 from .files import router as files_router, get_file_system
-from .tasks import read_tasks_file, write_tasks_file
+from .tasks import (
+    TASKS_FILE_PATH,
+    is_plain_tasks_file,
+    read_tasks_file,
+    write_tasks_file,
+)
 
 
 @asynccontextmanager
@@ -17,7 +23,11 @@ async def lifespan(app: FastAPI):
         file_system = app.dependency_overrides[get_file_system]()
     else:
         file_system = get_file_system()
-    
+
+    # Create the agent up front so the first chat request doesn't pay for it
+    if get_agent not in app.dependency_overrides:
+        await warm_agent()
+
     # Start file watching
     async with file_system.watch_files():
         yield
@@ -36,7 +46,13 @@ async def get_tasks_file(committed: bool = False):
     """
     Reads the content of TASKS.md from the git repository.
     """
-    return read_tasks_file(committed)
+    # Without frontmatter to strip, the file can be sent straight from disk
+    # rather than being read into memory first
+    if not committed and await asyncio.to_thread(is_plain_tasks_file):
+        return FileResponse(TASKS_FILE_PATH, media_type="text/plain; charset=utf-8")
+
+    # File and pygit2 I/O, so keep them off the event loop
+    return await asyncio.to_thread(read_tasks_file, committed)
 
 
 @app.post("/api/files/TASKS.md")
@@ -45,7 +61,7 @@ async def update_tasks_file(request: Request):
     Writes content to TASKS.md in the git repository.
     """
     new_content = (await request.body()).decode()
-    write_tasks_file(new_content)
+    await asyncio.to_thread(write_tasks_file, new_content)
     return {"message": "File updated successfully"}
 
 
@@ -2,24 +2,41 @@ import asyncio
 import hashlib
 import json
 import logging
-import subprocess
+import os
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from pydantic import BaseModel
 
 import yaml
 from fastapi import HTTPException
 
+try:
+    from yaml import CSafeDumper as SafeDumper, CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeDumper, SafeLoader
+
 from .config import get_config
+from .file_utils import atomic_write
 from .gemini_utils import get_genai_client
 
+logger = logging.getLogger(__name__)
+
 # --- Configuration ---
 GIT_CHECKOUT_LOCATION = Path.home() / ".local" / "share" / "organized" / "main"
 AUDIO_NOTES_DIR = Path.home() / ".local" / "share" / "organized" / "audio"
 NOTES_DIR = GIT_CHECKOUT_LOCATION / "notes"
 NOTES_METADATA_PATH = GIT_CHECKOUT_LOCATION / "notes.yaml"
 CONTEXT_FILE_PATH = GIT_CHECKOUT_LOCATION / "CONTEXT.md"
+# Kept outside both the sync destination and the git checkout
+AUDIO_HASH_CACHE_PATH = (
+    Path.home() / ".local" / "share" / "organized" / "audio-hashes.json"
+)
+# Maximum number of notes transcribed at once
+TRANSCRIPTION_CONCURRENCY = 4
+# Maximum number of audio files hashed at once. Hashing is limited by disk
+# bandwidth, so beyond a few readers more threads only add seeking.
+HASH_CONCURRENCY = min(8, os.cpu_count() or 1)
 
 
 # --- Data Models ---
@@ -33,60 +50,159 @@ class Note(BaseModel):
 # --- Helper Functions ---
 
 
+# ((mtime_ns, size), notes, notes by hash) for the last version of notes.yaml
+# parsed
+_note_metadata_cache: Optional[
+    Tuple[Tuple[int, int], List[Dict[str, Any]], Dict[str, Dict[str, Any]]]
+] = None
+
+
+def _load_note_metadata() -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """
+    Returns the cached notes metadata and an index of it by hash, reloading
+    notes.yaml if it changed. The results must not be modified.
+    """
+    global _note_metadata_cache
+
+    try:
+        st = NOTES_METADATA_PATH.stat()
+    except FileNotFoundError:
+        return [], {}
+
+    key = (st.st_mtime_ns, st.st_size)
+    if _note_metadata_cache is None or _note_metadata_cache[0] != key:
+        notes = yaml.load(NOTES_METADATA_PATH.read_bytes(), Loader=SafeLoader) or []
+        by_hash: Dict[str, Dict[str, Any]] = {}
+        for note in notes:
+            # Like a linear search, the first entry for a hash wins
+            by_hash.setdefault(note["hash"], note)
+        _note_metadata_cache = (key, notes, by_hash)
+
+    return _note_metadata_cache[1], _note_metadata_cache[2]
+
+
 def get_note_metadata() -> List[Dict[str, Any]]:
     """Loads the notes metadata from notes.yaml."""
-    if not NOTES_METADATA_PATH.exists():
-        return []
-    return yaml.safe_load(NOTES_METADATA_PATH.read_text())
+    notes, _ = _load_note_metadata()
+
+    # Callers modify the notes, so don't hand out the cached objects
+    return [dict(note) for note in notes]
 
 
 def save_note_metadata(notes: List[Dict[str, Any]]):
     """Saves the notes metadata to notes.yaml."""
-    NOTES_METADATA_PATH.write_text(yaml.dump(notes, sort_keys=False))
+    global _note_metadata_cache
+
+    _note_metadata_cache = None
+    with atomic_write(NOTES_METADATA_PATH) as f:
+        yaml.dump(notes, f, Dumper=SafeDumper, sort_keys=False)
+
+
+# path => (mtime_ns, size, hash), so unchanged audio files aren't rehashed on
+# every sync
+_file_hash_cache: Dict[Path, Tuple[int, int, str]] = {}
+_file_hash_cache_loaded = False
+_file_hash_cache_dirty = False
+
+
+def _load_file_hash_cache():
+    """
+    Fills the file hash cache from AUDIO_HASH_CACHE_PATH, so that audio files
+    aren't all rehashed after a restart. Only reads the file once.
+    """
+    global _file_hash_cache_loaded
+
+    if _file_hash_cache_loaded:
+        return
+    _file_hash_cache_loaded = True
+
+    try:
+        data = json.loads(AUDIO_HASH_CACHE_PATH.read_bytes())
+    except FileNotFoundError:
+        return
+    except ValueError as e:
+        logger.warning("Ignoring invalid %s: %s", AUDIO_HASH_CACHE_PATH, e)
+        return
+
+    try:
+        entries = {
+            Path(path): (mtime_ns, size, file_hash)
+            for path, (mtime_ns, size, file_hash) in data.items()
+        }
+    except (AttributeError, TypeError, ValueError) as e:
+        logger.warning("Ignoring malformed %s: %s", AUDIO_HASH_CACHE_PATH, e)
+        return
+
+    for path, entry in entries.items():
+        _file_hash_cache.setdefault(path, entry)
+
+
+def _save_file_hash_cache(audio_files: List[Path]):
+    """
+    Writes the cached hashes of audio_files to AUDIO_HASH_CACHE_PATH, if any
+    were computed since the last save.
+    """
+    global _file_hash_cache_dirty
+
+    if not _file_hash_cache_dirty:
+        return
+    _file_hash_cache_dirty = False
+
+    data = {str(f): _file_hash_cache[f] for f in audio_files if f in _file_hash_cache}
+    with atomic_write(AUDIO_HASH_CACHE_PATH) as f:
+        json.dump(data, f)
 
 
 def get_file_hash(file_path: Path) -> str:
     """Calculates the SHA256 hash of a file."""
-    sha256 = hashlib.sha256()
+    st = file_path.stat()
+    cached = _file_hash_cache.get(file_path)
+    if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+        return cached[2]
+
+    global _file_hash_cache_dirty
+
+    file_hash = _compute_file_hash(file_path)
+    _file_hash_cache[file_path] = (st.st_mtime_ns, st.st_size, file_hash)
+    _file_hash_cache_dirty = True
+    return file_hash
+
+
+def _compute_file_hash(file_path: Path) -> str:
+    """Calculates the SHA256 hash of a file, without caching."""
     with open(file_path, "rb") as f:
-        while chunk := f.read(8192):
-            sha256.update(chunk)
-    return sha256.hexdigest()
+        return hashlib.file_digest(f, "sha256").hexdigest()
 
 
-def get_audio_file_date(file_path: Path) -> str:
+async def get_audio_file_date(file_path: Path) -> str:
     """Extracts the recording date from an audio file using mediainfo."""
-    try:
-        result = subprocess.run(
-            ["mediainfo", "--Output=JSON", str(file_path)],
-            capture_output=True,
-            text=True,
-            check=True,
+    process = await asyncio.create_subprocess_exec(
+        "mediainfo",
+        "--Output=JSON",
+        str(file_path),
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error getting date from {file_path.name}: {stderr.decode()}",
         )
-        media_info = json.loads(result.stdout)
+
+    try:
+        media_info = json.loads(stdout)
         encoded_date_str = media_info["media"]["track"][0]["Encoded_Date"]
         # The date is in format 'YYYY-MM-DD HH:MM:SS UTC'
         dt = datetime.strptime(encoded_date_str, "%Y-%m-%d %H:%M:%S %Z")
         return dt.strftime("%Y-%m-%d-%H:%M:%S")
-    except (subprocess.CalledProcessError, KeyError, IndexError) as e:
+    except (KeyError, IndexError) as e:
         raise HTTPException(
             status_code=500, detail=f"Error getting date from {file_path.name}: {e}"
         ) from e
 
 
-async def transcribe_audio(file_path: Path) -> str:
-    """Transcribes an audio file using the Gemini API."""
-
-    context = ""
-    if CONTEXT_FILE_PATH.exists():
-        context = f"""
-Here is some context to help with the transcription:
-{CONTEXT_FILE_PATH.read_text()}
-"""
-    else:
-        context = ""
-
-    prompt = f"""
+TRANSCRIPTION_PROMPT = """
 Your are a transcriber for my personal audio notes. You should try to transcribe
 what I say literally, except for ums, ers, and repetitions which shoulbe left out.
 If things are unclear, make your best guess based on the context.
@@ -96,14 +212,39 @@ The transcription should start with a toplevel heading with a brief summary
 of the contents of the note, and when I change topic, add a section header.
 {context}
 """
+
+TRANSCRIPTION_CONTEXT = """
+Here is some context to help with the transcription:
+{context}
+"""
+
+
+def get_transcription_prompt() -> str:
+    """Builds the transcription prompt, including the contents of CONTEXT.md."""
+    try:
+        context = TRANSCRIPTION_CONTEXT.format(context=CONTEXT_FILE_PATH.read_text())
+    except FileNotFoundError:
+        context = ""
+
+    return TRANSCRIPTION_PROMPT.format(context=context)
+
+
+async def transcribe_audio(file_path: Path, prompt: Optional[str] = None) -> str:
+    """
+    Transcribes an audio file using the Gemini API. prompt defaults to
+    get_transcription_prompt().
+    """
+    if prompt is None:
+        prompt = await asyncio.to_thread(get_transcription_prompt)
+
     client = get_genai_client()
-    audio_file = client.files.upload(file=str(file_path))
-    logging.info(f"Requesting transcription for {file_path.name}")
-    response = client.models.generate_content(
+    audio_file = await client.aio.files.upload(file=str(file_path))
+    logger.info("Requesting transcription for %s", file_path.name)
+    response = await client.aio.models.generate_content(
         model="gemini-1.5-flash", contents=[prompt, audio_file]
     )
-    logging.info(f"Transcription complete for {file_path.name}")
-    logging.info(f"Usage metadata: {response.usage_metadata}")
+    logger.info("Transcription complete for %s", file_path.name)
+    logger.info("Usage metadata: %s", response.usage_metadata)
 
     if response.text is None:
         raise RuntimeError("No transcription returned")
@@ -121,8 +262,8 @@ def get_notes_list() -> List[Dict[str, Any]]:
 
 def get_note_by_hash(note_hash: str) -> str:
     """Returns the transcribed note for the given hash."""
-    notes = get_note_metadata()
-    note_entry = next((n for n in notes if n["hash"] == note_hash), None)
+    _, notes_by_hash = _load_note_metadata()
+    note_entry = notes_by_hash.get(note_hash)
     if not note_entry:
         raise HTTPException(status_code=404, detail="Note not found")
 
@@ -163,45 +304,90 @@ async def sync_notes() -> Dict[str, str]:
     notes = get_note_metadata()
     existing_hashes = {note["hash"] for note in notes}
 
-    for audio_file in AUDIO_NOTES_DIR.iterdir():
-        if audio_file.is_file():
-            file_hash = get_file_hash(audio_file)
-            if file_hash not in existing_hashes:
-                date_str = get_audio_file_date(audio_file)
-                notes.append(
-                    {
-                        "hash": file_hash,
-                        "date": date_str,
-                        "title": None,
-                        "processed": False,
-                    }
-                )
-                existing_hashes.add(file_hash)
-
-    save_note_metadata(notes)
-
-    # 4. Transcribe new notes
+    # Hash each audio file once, for finding both new notes and the audio
+    # files of notes to transcribe. Hashing and the other blocking calls below
+    # run off the event loop so a sync doesn't stall the rest of the server;
+    # hashlib releases the GIL, so the files are hashed in parallel.
+    audio_files = [f for f in AUDIO_NOTES_DIR.iterdir() if f.is_file()]
+    await asyncio.to_thread(_load_file_hash_cache)
+
+    hash_semaphore = asyncio.Semaphore(HASH_CONCURRENCY)
+
+    async def hash_file(audio_file: Path) -> str:
+        async with hash_semaphore:
+            return await asyncio.to_thread(get_file_hash, audio_file)
+
+    file_hashes = await asyncio.gather(*(hash_file(f) for f in audio_files))
+    await asyncio.to_thread(_save_file_hash_cache, audio_files)
+    audio_files_by_hash: Dict[str, Path] = {}
+    for file_hash, audio_file in zip(file_hashes, audio_files):
+        audio_files_by_hash.setdefault(file_hash, audio_file)
+
+    # Getting each date runs mediainfo, so run a few at once, like hashing
+    new_audio_files = {
+        file_hash: audio_file
+        for file_hash, audio_file in audio_files_by_hash.items()
+        if file_hash not in existing_hashes
+    }
+
+    async def get_date(audio_file: Path) -> str:
+        async with hash_semaphore:
+            return await get_audio_file_date(audio_file)
+
+    dates = await asyncio.gather(*(get_date(f) for f in new_audio_files.values()))
+    for file_hash, date_str in zip(new_audio_files, dates):
+        notes.append(
+            {
+                "hash": file_hash,
+                "date": date_str,
+                "title": None,
+                "processed": False,
+            }
+        )
+    added_notes = bool(new_audio_files)
+
+    # 4. Transcribe new notes. Each transcription is an independent API call,
+    # so run a few at once.
+    pending: Dict[Path, Tuple[Dict[str, Any], Path]] = {}
     for note in notes:
         transcription_path = NOTES_DIR / f"{note['date']}.md"
-        if not transcription_path.exists():
-            audio_file_path = None
-            # Find the audio file by hash
-            for f in AUDIO_NOTES_DIR.iterdir():
-                if f.is_file() and get_file_hash(f) == note["hash"]:
-                    audio_file_path = f
-                    break
-
+        if transcription_path not in pending and not transcription_path.exists():
+            audio_file_path = audio_files_by_hash.get(note["hash"])
             if audio_file_path:
-                transcription = await transcribe_audio(audio_file_path)
-                transcription_path.write_text(transcription)
-
-                # Extract title from the first heading
-                first_line = transcription.splitlines()[0]
-                if first_line.startswith("# "):
-                    note["title"] = first_line[2:].strip()
-                else:
-                    note["title"] = "Untitled Note"
+                pending[transcription_path] = (note, audio_file_path)
+
+    prompt = await asyncio.to_thread(get_transcription_prompt)
+    semaphore = asyncio.Semaphore(TRANSCRIPTION_CONCURRENCY)
+
+    async def transcribe(
+        note: Dict[str, Any], audio_file_path: Path, transcription_path: Path
+    ) -> None:
+        async with semaphore:
+            transcription = await transcribe_audio(audio_file_path, prompt)
+        transcription_path.write_text(transcription)
+
+        # Extract title from the first heading
+        first_line = transcription.splitlines()[0]
+        if first_line.startswith("# "):
+            note["title"] = first_line[2:].strip()
+        else:
+            note["title"] = "Untitled Note"
+
+    results = await asyncio.gather(
+        *(
+            transcribe(note, audio_file_path, transcription_path)
+            for transcription_path, (note, audio_file_path) in pending.items()
+        ),
+        return_exceptions=True,
+    )
 
-                save_note_metadata(notes)
+    # Write notes.yaml once, with both the new notes and the titles of the
+    # transcriptions that succeeded, even if some failed. A note that is
+    # lost if the sync is interrupted is found again by the next sync.
+    if added_notes or pending:
+        await asyncio.to_thread(save_note_metadata, notes)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
 
     return {"message": "Notes synced successfully"}
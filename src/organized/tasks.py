@@ -3,9 +3,18 @@ Centralized module for handling TASKS.md file operations.
 """
 
 import subprocess
-import yaml
 from pathlib import Path
-from typing import Tuple, Dict, Any
+from typing import Tuple, Dict, Any, Optional
+
+import pygit2
+import yaml
+
+try:
+    from yaml import CSafeDumper as SafeDumper, CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeDumper, SafeLoader
+
+from .file_utils import atomic_write
 
 # Constants
 GIT_CHECKOUT_LOCATION = Path.home() / ".local" / "share" / "organized" / "main"
@@ -20,10 +29,51 @@ def extract_frontmatter(content: str) -> Tuple[Dict[str, Any], str]:
     if content.startswith("---"):
         parts = content.split("---", 2)
         if len(parts) >= 3:
-            return yaml.safe_load(parts[1]), parts[2].lstrip()
+            return yaml.load(parts[1], Loader=SafeLoader), parts[2].lstrip()
     return {}, content
 
 
+def read_frontmatter(path: Path) -> Dict[str, Any]:
+    """
+    Reads just the YAML frontmatter of a file, as extract_frontmatter() would
+    find it, without reading the rest of the file.
+    """
+    with path.open() as f:
+        head = f.read(3)
+        if head != "---":
+            return {}
+        while (end := head.find("---", 3)) == -1:
+            chunk = f.read(4096)
+            if not chunk:
+                return {}
+            head += chunk
+    return yaml.load(head[3:end], Loader=SafeLoader)
+
+
+# ((mtime_ns, size), frontmatter) for the last version of TASKS.md whose
+# frontmatter was read
+_frontmatter_cache: Optional[Tuple[Tuple[int, int], Dict[str, Any]]] = None
+
+
+def _read_tasks_frontmatter() -> Dict[str, Any]:
+    """
+    Returns the frontmatter of TASKS.md, rereading it only if the file changed.
+    The result must not be modified.
+    """
+    global _frontmatter_cache
+
+    try:
+        st = TASKS_FILE_PATH.stat()
+    except FileNotFoundError:
+        return {}
+
+    key = (st.st_mtime_ns, st.st_size)
+    if _frontmatter_cache is None or _frontmatter_cache[0] != key:
+        _frontmatter_cache = (key, read_frontmatter(TASKS_FILE_PATH))
+
+    return _frontmatter_cache[1]
+
+
 def get_default_tasks_content() -> str:
     """Returns the default TASKS.md content when file doesn't exist."""
     return """## My First project
@@ -70,6 +120,27 @@ def ensure_git_repo():
         subprocess.run(["git", "init"], cwd=GIT_CHECKOUT_LOCATION, check=True)
 
 
+def _read_committed_tasks_file() -> Optional[str]:
+    """
+    Reads TASKS.md as of HEAD, in-process rather than by running `git show`.
+
+    Callers run in worker threads, so each call opens its own repository
+    handle rather than sharing one; that is still much cheaper than
+    starting git.
+
+    Returns:
+        The content, or None if there is no committed TASKS.md
+    """
+    try:
+        repo = pygit2.Repository(str(GIT_CHECKOUT_LOCATION))
+        blob = repo.revparse_single("HEAD:TASKS.md")
+    except (KeyError, pygit2.GitError):
+        return None
+    if not isinstance(blob, pygit2.Blob):
+        return None
+    return blob.data.decode("utf-8")
+
+
 def read_tasks_file(committed: bool = False) -> str:
     """
     Reads the content of TASKS.md from the git repository.
@@ -84,25 +155,37 @@ def read_tasks_file(committed: bool = False) -> str:
     if not TASKS_FILE_PATH.exists():
         return get_default_tasks_content()
 
+    global _frontmatter_cache
+
     if committed:
-        try:
-            content = subprocess.run(
-                ["git", "show", "HEAD:TASKS.md"],
-                cwd=GIT_CHECKOUT_LOCATION,
-                check=True,
-                capture_output=True,
-                text=True,
-            ).stdout
-        except subprocess.CalledProcessError:
+        content = _read_committed_tasks_file()
+        if content is None:
             # Handle case where file doesn't exist in git history
             return ""
+        _, content_without_frontmatter = extract_frontmatter(content)
     else:
+        st = TASKS_FILE_PATH.stat()
         content = TASKS_FILE_PATH.read_text()
+        frontmatter, content_without_frontmatter = extract_frontmatter(content)
+        # Edits read the file and then write it back, so this saves
+        # write_tasks_file() from reading the frontmatter again
+        _frontmatter_cache = ((st.st_mtime_ns, st.st_size), frontmatter)
 
-    _, content_without_frontmatter = extract_frontmatter(content)
     return content_without_frontmatter
 
 
+def is_plain_tasks_file() -> bool:
+    """
+    Checks whether TASKS.md exists and has no frontmatter, so that the working
+    version can be served exactly as it is on disk.
+    """
+    try:
+        with TASKS_FILE_PATH.open("rb") as f:
+            return f.read(3) != b"---"
+    except FileNotFoundError:
+        return False
+
+
 def write_tasks_file(new_content: str) -> None:
     """
     Writes content to TASKS.md in the git repository.
@@ -111,19 +194,27 @@ def write_tasks_file(new_content: str) -> None:
     Args:
         new_content: The new content to write (without frontmatter).
     """
+    global _frontmatter_cache
+
     ensure_git_repo()
 
     # Get existing frontmatter if file exists
-    existing_frontmatter = {}
-    if TASKS_FILE_PATH.exists():
-        existing_frontmatter, _ = extract_frontmatter(TASKS_FILE_PATH.read_text())
+    existing_frontmatter = _read_tasks_frontmatter()
 
     # Add frontmatter back if it existed
     if existing_frontmatter:
         final_content = (
-            "---\n" + yaml.dump(existing_frontmatter) + "---\n\n" + new_content
+            "---\n"
+            + yaml.dump(existing_frontmatter, Dumper=SafeDumper)
+            + "---\n\n"
+            + new_content
         )
     else:
         final_content = new_content
 
-    TASKS_FILE_PATH.write_text(final_content)
+    with atomic_write(TASKS_FILE_PATH) as f:
+        f.write(final_content)
+
+    # The frontmatter is unchanged, so the next write doesn't need to reread it
+    st = TASKS_FILE_PATH.stat()
+    _frontmatter_cache = ((st.st_mtime_ns, st.st_size), existing_frontmatter)
@@ -99,15 +99,13 @@ Expectation for required parameters:
         # Read current content
         current_content = tasks.read_tasks_file(committed=False)
 
-        # Check if old_string exists
-        if input_data.old_string not in current_content:
+        # Count occurrences, which also checks that old_string exists
+        occurrence_count = current_content.count(input_data.old_string)
+        if occurrence_count == 0:
             return StringToolOutput(
                 result="Error: Could not find the specified text to replace. The text was not found in TASKS.md."
             )
 
-        # Count occurrences
-        occurrence_count = current_content.count(input_data.old_string)
-
         # Handle expected_replacements validation
         if input_data.expected_replacements is not None:
             if occurrence_count != input_data.expected_replacements:
@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta, timezone
+from itertools import count
+from unittest.mock import patch
+
+from beeai_framework.agents.tool_calling import ToolCallingAgent
+
+from src.organized.agent import _TEMPLATES
+
+
+class TestSystemPrompt:
+    def test_system_prompt_is_stable(self):
+        """Test that the rendered system prompt doesn't change between requests."""
+        # Every call to BeeAI's clock is a second later than the last, so a
+        # timestamp in the prompt would show up
+        start = datetime(2025, 7, 13, 12, 0, 0, tzinfo=timezone.utc)
+        seconds = count()
+        with patch(
+            "beeai_framework.agents.tool_calling.prompts.datetime"
+        ) as mock_datetime:
+            mock_datetime.now.side_effect = lambda tz=None: (
+                start + timedelta(seconds=next(seconds))
+            )
+
+            templates1 = ToolCallingAgent._generate_templates(_TEMPLATES)
+            prompt1 = templates1.system.render()
+
+            templates2 = ToolCallingAgent._generate_templates(_TEMPLATES)
+            assert templates2.system.render() == prompt1
+            assert templates1.system.render() == prompt1
@@ -3,6 +3,7 @@ import tempfile
 from pathlib import Path
 import subprocess
 import asyncio
+from typing import Optional
 from unittest.mock import patch
 
 from src.organized.file_system import FileSystem, FileSystemWatcher
@@ -15,7 +16,7 @@ def git_repo():
         repo_path = Path(temp_dir)
 
         # Initialize git repo
-        subprocess.run(["git", "init"], cwd=repo_path, check=True)
+        subprocess.run(["git", "init", "-b", "main"], cwd=repo_path, check=True)
         subprocess.run(
             ["git", "config", "user.email", "test@example.com"],
             cwd=repo_path,
@@ -45,7 +46,9 @@ class MockWatcher(FileSystemWatcher):
         self.changes = []
         self._condition = asyncio.Condition()
 
-    def on_file_change(self, filename: str, content: str) -> None:
+    def on_file_change(
+        self, filename: str, content: str, source_handle: Optional[str] = None
+    ) -> None:
         # Always add the change to the list synchronously
         self.changes.append((filename, content))
 
@@ -107,7 +110,7 @@ class TestFileSystem:
         fs = FileSystem(git_repo)
         assert fs.repository_path == git_repo
         assert fs.files == {}
-        assert fs.watchers == []
+        assert fs.watchers == set()
 
     def test_repository_path_validation(self):
         """Test that FileSystem validates the repository path."""
@@ -132,6 +135,23 @@ class TestFileSystem:
         assert fs.files["test.txt"].ref_count == 1
         assert fs.files["test.txt"].content == "initial content"
 
+    @pytest.mark.asyncio
+    async def test_open_file_async(self, git_repo):
+        """Test opening files without blocking the event loop."""
+        fs = FileSystem(git_repo)
+        content = await fs.open_file_async("test.txt")
+
+        assert content == "initial content"
+        assert fs.files["test.txt"].ref_count == 1
+
+        # Opening again uses the tracked state
+        content = await fs.open_file_async("test.txt")
+        assert content == "initial content"
+        assert fs.files["test.txt"].ref_count == 2
+
+        with pytest.raises(FileNotFoundError, match="File not found: nonexistent.txt"):
+            await fs.open_file_async("nonexistent.txt")
+
     def test_open_nonexistent_file(self, git_repo):
         """Test opening a file that doesn't exist."""
         fs = FileSystem(git_repo)
@@ -164,6 +184,19 @@ class TestFileSystem:
         fs.close_file("test.txt")
         assert "test.txt" not in fs.files
 
+    def test_close_file_count(self, git_repo):
+        """Test closing several references to a file at once."""
+        fs = FileSystem(git_repo)
+
+        for _ in range(3):
+            fs.open_file("test.txt")
+
+        fs.close_file("test.txt", count=2)
+        assert fs.files["test.txt"].ref_count == 1
+
+        fs.close_file("test.txt", count=1)
+        assert "test.txt" not in fs.files
+
     def test_close_unopened_file(self, git_repo):
         """Test closing a file that wasn't opened doesn't crash."""
         fs = FileSystem(git_repo)
@@ -187,6 +220,28 @@ class TestFileSystem:
         fs.remove_watcher(watcher1)  # Should not raise
         assert len(fs.watchers) == 1
 
+    def test_watcher_unsubscribes_during_notification(self, git_repo):
+        """Test that a watcher can unsubscribe itself when notified."""
+        fs = FileSystem(git_repo)
+
+        class OneShotWatcher(FileSystemWatcher):
+            def __init__(self):
+                self.changes = []
+
+            def on_file_change(self, filename, content, source_handle=None):
+                self.changes.append((filename, content))
+                fs.unsubscribe(self, filename)
+
+        watchers = [OneShotWatcher(), OneShotWatcher()]
+        for watcher in watchers:
+            fs.subscribe(watcher, "oneshot.txt")
+
+        fs.write_file("oneshot.txt", "", "first")
+        fs.write_file("oneshot.txt", "first", "second")
+
+        for watcher in watchers:
+            assert watcher.changes == [("oneshot.txt", "first")]
+
     def test_write_file_new_file(self, git_repo):
         """Test writing to a new file."""
         fs = FileSystem(git_repo)
@@ -350,6 +405,18 @@ class TestFileSystem:
         # The file should NOT be in fs.files since it wasn't opened
         assert "brand_new.txt" not in fs.files
 
+    def test_write_file_leaves_no_temp_files(self, git_repo):
+        """Test that repeated writes don't leave temporary files behind."""
+        fs = FileSystem(git_repo)
+        (git_repo / "subdir").mkdir()
+
+        content = ""
+        for i in range(3):
+            content = fs.write_file("subdir/file.txt", content, f"version {i}")
+
+        assert sorted(p.name for p in (git_repo / "subdir").iterdir()) == ["file.txt"]
+        assert (git_repo / "subdir" / "file.txt").read_text() == "version 2"
+
     def test_write_file_existing_file_proper_refcount(self, git_repo):
         """Test that write_file properly handles refcounts for existing files."""
         fs = FileSystem(git_repo)
@@ -1087,3 +1154,86 @@ class TestHEADChangeDetection:
                 lambda c: c[0] == "@test.txt" and "feature branch content" in c[1]
             )
             assert found, "Branch change should update committed file content"
+
+    @pytest.mark.asyncio
+    async def test_packed_ref_change_detection(self, git_repo):
+        """Test detection of a branch update that only changes .git/packed-refs."""
+        fs = FileSystem(git_repo)
+        watcher = MockWatcher()
+        fs.add_watcher(watcher)
+
+        # Make a commit on another branch, then go back and pack the refs, so
+        # that main only exists in packed-refs
+        subprocess.run(["git", "checkout", "-b", "other"], cwd=git_repo, check=True)
+        (git_repo / "test.txt").write_text("packed ref content")
+        subprocess.run(["git", "add", "test.txt"], cwd=git_repo, check=True)
+        subprocess.run(
+            ["git", "commit", "-m", "Other branch commit"], cwd=git_repo, check=True
+        )
+        subprocess.run(["git", "checkout", "main"], cwd=git_repo, check=True)
+        subprocess.run(["git", "pack-refs", "--all"], cwd=git_repo, check=True)
+        assert not (git_repo / ".git" / "refs" / "heads" / "main").exists()
+
+        fs.open_file("@test.txt")
+
+        async with fs.watch_files():
+            # Point main at the other commit by rewriting packed-refs the way
+            # git does, with a rename
+            packed_refs = git_repo / ".git" / "packed-refs"
+            lines = packed_refs.read_text().splitlines()
+            main_hash = next(
+                line.split()[0] for line in lines if line.endswith(" refs/heads/main")
+            )
+            other_hash = next(
+                line.split()[0] for line in lines if line.endswith(" refs/heads/other")
+            )
+            new_packed_refs = git_repo / ".git" / "packed-refs.new"
+            new_packed_refs.write_text(
+                packed_refs.read_text().replace(
+                    f"{main_hash} refs/heads/main", f"{other_hash} refs/heads/main"
+                )
+            )
+            new_packed_refs.rename(packed_refs)
+
+            found = await watcher.wait_for(
+                lambda c: c[0] == "@test.txt" and "packed ref content" in c[1]
+            )
+            assert found, "Change to a packed ref should update committed file content"
+
+    @pytest.mark.asyncio
+    async def test_new_ref_directory_change_detection(self, git_repo):
+        """Test detection of the first commit on a branch in a new ref directory."""
+        fs = FileSystem(git_repo)
+
+        # HEAD points to refs/heads/topic/new, and refs/heads/topic doesn't
+        # exist until something is committed
+        subprocess.run(
+            ["git", "checkout", "--orphan", "topic/new"], cwd=git_repo, check=True
+        )
+        assert not (git_repo / ".git" / "refs" / "heads" / "topic").exists()
+
+        async with fs.watch_files():
+            (git_repo / "test.txt").write_text("new branch content")
+            subprocess.run(["git", "add", "test.txt"], cwd=git_repo, check=True)
+            subprocess.run(
+                ["git", "commit", "-m", "First commit on topic/new"],
+                cwd=git_repo,
+                check=True,
+            )
+            new_head = subprocess.run(
+                ["git", "rev-parse", "HEAD"],
+                cwd=git_repo,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout.strip()
+
+            # Nothing committed could be open before, so check the tracked
+            # HEAD directly
+            for _ in range(100):
+                if fs._current_head_commit == new_head:
+                    break
+                await asyncio.sleep(0.01)
+            assert fs._current_head_commit == new_head, (
+                "First commit in a new ref directory should be detected"
+            )
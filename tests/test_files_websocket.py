@@ -6,11 +6,12 @@ import subprocess
 import asyncio
 from unittest.mock import patch, AsyncMock
 
+from diff_match_patch import diff_match_patch
 from fastapi.testclient import TestClient
 
 from src.organized.main import app
-from src.organized.file_system import FileSystem
-from src.organized.files import get_file_system
+from src.organized.file_system import FileSystem, content_hash
+from src.organized.files import Connection, get_file_system
 
 
 @pytest.fixture
@@ -67,6 +68,14 @@ class TestBasicWebSocketConnection:
             assert response["type"] == "error"
             assert "Unknown command type" in response["message"]
 
+    def test_websocket_accepts_binary_frames(self, client):
+        """Test that commands can also be sent as binary frames."""
+        with client.websocket_connect("/ws") as websocket:
+            websocket.send_json({"type": "invalid_test"}, mode="binary")
+            response = websocket.receive_json()
+            assert response["type"] == "error"
+            assert "Unknown command type" in response["message"]
+
 
 class TestOpenFileCommand:
     """Test the open_file command and file_opened event."""
@@ -265,6 +274,67 @@ class TestWriteFileCommand:
             assert "Invalid handle" in response["message"]
 
 
+class TestPatchFileCommand:
+    """Test the patch_file command."""
+
+    def test_patch_opened_file(self, client, git_repo):
+        """Test patching an opened file returns file_written event."""
+        test_file = git_repo / "test.md"
+        test_file.write_text("original content")
+
+        dmp = diff_match_patch()
+        patch_text = dmp.patch_toText(dmp.patch_make("original content", "patched content"))
+
+        with client.websocket_connect("/ws") as websocket:
+            websocket.send_json({
+                "type": "open_file",
+                "path": "test.md",
+                "handle": "handle1"
+            })
+            websocket.receive_json()  # Skip file_opened event
+
+            websocket.send_json({
+                "type": "patch_file",
+                "handle": "handle1",
+                "last_hash": content_hash("original content"),
+                "patch": patch_text
+            })
+
+            response = websocket.receive_json()
+            assert response["type"] == "file_written"
+            assert response["handle"] == "handle1"
+            assert response["content"] == "patched content"
+            assert test_file.read_text() == "patched content"
+
+    def test_patch_file_stale_hash_returns_error(self, client, git_repo):
+        """Test that a patch against an old version of the file is rejected."""
+        test_file = git_repo / "test.md"
+        test_file.write_text("original content")
+
+        dmp = diff_match_patch()
+        patch_text = dmp.patch_toText(dmp.patch_make("old content", "patched content"))
+
+        with client.websocket_connect("/ws") as websocket:
+            websocket.send_json({
+                "type": "open_file",
+                "path": "test.md",
+                "handle": "handle1"
+            })
+            websocket.receive_json()  # Skip file_opened event
+
+            websocket.send_json({
+                "type": "patch_file",
+                "handle": "handle1",
+                "last_hash": content_hash("old content"),
+                "patch": patch_text
+            })
+
+            response = websocket.receive_json()
+            assert response["type"] == "error"
+            assert "changed" in response["message"]
+            assert test_file.read_text() == "original content"
+
+
 class TestCommitCommand:
     """Test the commit command and committed event."""
 
@@ -343,6 +413,24 @@ class TestHandleBasedFileManagement:
             assert response["type"] == "file_closed"
             assert response["handle"] == "handle2"
 
+    def test_disconnect_releases_all_handles(self, client, file_system, git_repo):
+        """Test that disconnecting closes every handle a connection had open."""
+        test_file = git_repo / "multihandle.md"
+        test_file.write_text("test content")
+
+        with client.websocket_connect("/ws") as websocket:
+            for handle in ("handle1", "handle2", "handle3"):
+                websocket.send_json({
+                    "type": "open_file",
+                    "path": "multihandle.md",
+                    "handle": handle
+                })
+                websocket.receive_json()  # file_opened event
+
+            assert file_system.files["multihandle.md"].ref_count == 3
+
+        assert "multihandle.md" not in file_system.files
+
     def test_closing_handle_twice_returns_error(self, client, git_repo):
         """Test that closing the same handle twice returns an error."""
         test_file = git_repo / "test.md"
@@ -489,6 +577,53 @@ class TestFileUpdatedEvents:
             assert ("file_updated", "handle2") in events_received
 
 
+class TestFileUpdatedCoalescing:
+    """Test that unsent file_updated events are replaced by newer ones."""
+
+    @staticmethod
+    def sent_messages(websocket):
+        return [json.loads(call.args[0]) for call in websocket.send_text.call_args_list]
+
+    @pytest.mark.asyncio
+    async def test_pending_update_replaced(self, file_system):
+        """Test that only the latest content is sent for a queued update."""
+        websocket = AsyncMock()
+        connection = Connection(websocket, file_system)
+        connection.file_handles["test.txt"] = {"handle1"}
+
+        connection.on_file_change("test.txt", "first")
+        connection.on_file_change("test.txt", "second")
+
+        async with connection:
+            await asyncio.sleep(0.1)
+
+        assert self.sent_messages(websocket) == [
+            {"type": "file_updated", "handle": "handle1", "content": "second"}
+        ]
+
+    @pytest.mark.asyncio
+    async def test_update_not_moved_before_reply(self, file_system):
+        """Test that an update queued after a reply isn't merged into an earlier one."""
+        websocket = AsyncMock()
+        connection = Connection(websocket, file_system)
+        connection.file_handles["test.txt"] = {"handle1"}
+
+        connection.on_file_change("test.txt", "first")
+        await connection.send_json(
+            {"type": "file_written", "handle": "handle1", "content": "second"}
+        )
+        connection.on_file_change("test.txt", "third")
+
+        async with connection:
+            await asyncio.sleep(0.1)
+
+        assert [m["content"] for m in self.sent_messages(websocket)] == [
+            "first",
+            "second",
+            "third",
+        ]
+
+
 class TestErrorHandling:
     """Test error handling scenarios."""
 